@@ -1,20 +1,53 @@
 # database/__init__.py - FIXED with get_db_session and get_pool_status exports
-from .database import get_db, create_tables, test_connection_and_setup, engine, SessionLocal, get_db_session, get_pool_status
-from .models import Base, User, MusicGeneration, UsageStats, SystemMetrics
-from .operations import DatabaseOperations
+# Submodules are imported lazily (PEP 562) so importing the package doesn't
+# build the engine or the ORM mappers until something actually needs them.
+from importlib import import_module
 
-__all__ = [
+_EXPORTS = {
+    "get_db": ".database",
+    "get_db_session": ".database",
+    "get_pool_status": ".database",
+    "get_async_db": ".database",
+    "get_async_db_session": ".database",
+    "pool_pressure_monitor": ".database",
+    "create_tables": ".database",
+    "test_connection_and_setup": ".database",
+    "engine": ".database",
+    "SessionLocal": ".database",
+    "Base": ".models",
+    "User": ".models",
+    "MusicGeneration": ".models",
+    "UsageStats": ".models",
+    "SystemMetrics": ".models",
+    "DatabaseOperations": ".operations",
+}
+
+__all__ = (
     "get_db",
     "get_db_session",
     "get_pool_status",
+    "get_async_db",
+    "get_async_db_session",
+    "pool_pressure_monitor",
     "create_tables",
     "test_connection_and_setup",
-    "engine", 
+    "engine",
     "SessionLocal",
     "Base",
     "User",
-    "MusicGeneration", 
+    "MusicGeneration",
     "UsageStats",
     "SystemMetrics",
     "DatabaseOperations"
-]
\ No newline at end of file
+)
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module_name, __name__), name)
+    globals()[name] = value  # cache for subsequent lookups
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
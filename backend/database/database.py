@@ -2,22 +2,61 @@
 # File: database/database.py - COMPLETE REWRITE
 # =============================================================================
 
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, text, event
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
-from sqlalchemy.pool import QueuePool
+from sqlalchemy.pool import QueuePool, NullPool
 import os
+import time
+import asyncio
 import logging
-from typing import Generator
-from contextlib import contextmanager
+import threading
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Generator, AsyncGenerator
+from contextlib import contextmanager, asynccontextmanager
 
 # Configure logging for database operations
 logger = logging.getLogger(__name__)
 
+# Optional Prometheus metrics for the connection pool
+try:
+    from prometheus_client import Histogram, Gauge
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+# =============================================================================
+# ENVIRONMENT FLAGS (read once at import, not per request)
+# =============================================================================
+
+def _env_flag(name: str) -> bool:
+    """Read a boolean environment flag ("true"/"false")"""
+    return os.getenv(name, "false").lower() == "true"
+
+_DB_DEBUG = _env_flag("DB_DEBUG")
+_DB_ECHO = _env_flag("DB_ECHO")
+_DB_ECHO_POOL = _env_flag("DB_ECHO_POOL")
+_ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
+_USE_EXTERNAL_POOL = _env_flag("USE_EXTERNAL_POOL")  # e.g. pgbouncer in transaction mode
+
+def refresh_env_flags():
+    """Re-read the cached environment flags (useful in tests)"""
+    global _DB_DEBUG, _DB_ECHO, _DB_ECHO_POOL, _ENVIRONMENT, _USE_EXTERNAL_POOL
+    _DB_DEBUG = _env_flag("DB_DEBUG")
+    _DB_ECHO = _env_flag("DB_ECHO")
+    _DB_ECHO_POOL = _env_flag("DB_ECHO_POOL")
+    _ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
+    _USE_EXTERNAL_POOL = _env_flag("USE_EXTERNAL_POOL")
+    get_database_url.cache_clear()
+    get_database_config.cache_clear()
+
 # =============================================================================
 # FIXED DATABASE CONFIGURATION WITH PROPER 2.0 SYNTAX
 # =============================================================================
 
 # Environment-aware database URL (FIXES CRITICAL ISSUE #4 - HARDCODED PATHS)
+@lru_cache(maxsize=1)
 def get_database_url():
     """Get database URL from environment with fallbacks"""
     return os.getenv(
@@ -30,19 +69,22 @@ def get_database_url():
 
 DATABASE_URL = get_database_url()
 
+@lru_cache(maxsize=1)
 def get_database_config():
-    """Get database configuration based on environment"""
-    env = os.getenv("ENVIRONMENT", "development")
-    
+    """Get database configuration based on environment (read-only, cached)"""
     configs = {
         "production": {
             "pool_size": 20,
             "max_overflow": 30,
             "pool_timeout": 60,
-            "pool_recycle": 3600,
-            "pool_pre_ping": True,
+            "pool_recycle": 1800,
+            "pool_pre_ping": False,  # keepalives + pool_recycle instead of a SELECT 1 per checkout
             "connect_args": {
                 "connect_timeout": 10,
+                "keepalives": 1,
+                "keepalives_idle": 30,
+                "keepalives_interval": 10,
+                "keepalives_count": 3,
                 "application_name": "MusicGenie-Production"
             }
         },
@@ -51,9 +93,13 @@ def get_database_config():
             "max_overflow": 20,
             "pool_timeout": 30,
             "pool_recycle": 1800,
-            "pool_pre_ping": True,
+            "pool_pre_ping": False,  # keepalives + pool_recycle instead of a SELECT 1 per checkout
             "connect_args": {
                 "connect_timeout": 10,
+                "keepalives": 1,
+                "keepalives_idle": 30,
+                "keepalives_interval": 10,
+                "keepalives_count": 3,
                 "application_name": "MusicGenie-Staging"
             }
         },
@@ -62,15 +108,36 @@ def get_database_config():
             "max_overflow": 10,
             "pool_timeout": 30,
             "pool_recycle": 1800,
-            "pool_pre_ping": True,
+            "pool_pre_ping": False,  # keepalives + pool_recycle instead of a SELECT 1 per checkout
             "connect_args": {
                 "connect_timeout": 10,
+                "keepalives": 1,
+                "keepalives_idle": 30,
+                "keepalives_interval": 10,
+                "keepalives_count": 3,
                 "application_name": "MusicGenie-Development"
             }
         }
     }
     
-    return configs.get(env, configs["development"])
+    config = dict(configs.get(_ENVIRONMENT, configs["development"]))
+    config["connect_args"] = dict(config["connect_args"])
+    
+    # Deployment overrides
+    config["pool_size"] = int(os.getenv("DB_POOL_SIZE", config["pool_size"]))
+    config["max_overflow"] = int(os.getenv("DB_MAX_OVERFLOW", config["max_overflow"]))
+    
+    # Keep reusing the most recently returned connections so a small hot set
+    # stays warm (and idle extras get recycled) instead of round-robining
+    config["pool_use_lifo"] = True
+    
+    # Server-side cap on pathological queries. Not sent through pgbouncer,
+    # which rejects the 'options' startup parameter by default.
+    statement_timeout_ms = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "5000"))
+    if statement_timeout_ms > 0 and not _USE_EXTERNAL_POOL:
+        config["connect_args"]["options"] = f"-c statement_timeout={statement_timeout_ms}"
+    
+    return MappingProxyType(config)
 
 # Get configuration based on environment
 db_config = get_database_config()
@@ -80,20 +147,83 @@ db_config = get_database_config()
 # =============================================================================
 
 # Create engine with proper SQLAlchemy 2.0 syntax
-engine = create_engine(
-    DATABASE_URL,
-    poolclass=QueuePool,
-    pool_size=db_config["pool_size"],
-    max_overflow=db_config["max_overflow"],
-    pool_timeout=db_config["pool_timeout"],
-    pool_recycle=db_config["pool_recycle"],
-    pool_pre_ping=db_config["pool_pre_ping"],
-    connect_args=db_config["connect_args"],
-    echo=os.getenv("DB_ECHO", "false").lower() == "true",
-    echo_pool=os.getenv("DB_ECHO_POOL", "false").lower() == "true",
-    # SQLAlchemy 2.0 - future=True is now default, but we can be explicit
-    future=True
-)
+if _USE_EXTERNAL_POOL:
+    # Pooling is done out-of-process (pgbouncer), so every checkout opens a
+    # cheap client connection to the bouncer and closes it on release.
+    # pgbouncer also takes care of dead server connections - no pre-ping.
+    engine = create_engine(
+        DATABASE_URL,
+        poolclass=NullPool,
+        pool_pre_ping=False,
+        connect_args=db_config["connect_args"],
+        echo=_DB_ECHO,
+        echo_pool=_DB_ECHO_POOL,
+        executemany_mode="values_plus_batch",
+        insertmanyvalues_page_size=1000,
+        query_cache_size=1200,
+        future=True
+    )
+else:
+    engine = create_engine(
+        DATABASE_URL,
+        poolclass=QueuePool,
+        pool_size=db_config["pool_size"],
+        max_overflow=db_config["max_overflow"],
+        pool_timeout=db_config["pool_timeout"],
+        pool_recycle=db_config["pool_recycle"],
+        pool_pre_ping=db_config["pool_pre_ping"],
+        pool_use_lifo=db_config["pool_use_lifo"],
+        pool_reset_on_return="rollback",
+        connect_args=db_config["connect_args"],
+        echo=_DB_ECHO,
+        echo_pool=_DB_ECHO_POOL,
+        # Batch executemany INSERTs into multi-row VALUES pages
+        executemany_mode="values_plus_batch",
+        insertmanyvalues_page_size=1000,
+        query_cache_size=1200,
+        # SQLAlchemy 2.0 - future=True is now default, but we can be explicit
+        future=True
+    )
+
+# =============================================================================
+# POOL METRICS (Prometheus, via SQLAlchemy pool events)
+# =============================================================================
+
+if PROMETHEUS_AVAILABLE:
+    POOL_ACQUIRE_SECONDS = Histogram(
+        "db_pool_acquire_seconds",
+        "Time spent waiting for a DB connection from the pool (includes connect/pre-ping)"
+    )
+    POOL_HOLD_SECONDS = Histogram(
+        "db_pool_connection_hold_seconds",
+        "Time a pooled DB connection stays checked out, from checkout to checkin"
+    )
+    POOL_CHECKED_OUT = Gauge(
+        "db_pool_checked_out",
+        "DB connections currently checked out of the pool"
+    )
+
+    @event.listens_for(engine, "checkout")
+    def _on_pool_checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checkout_started"] = time.perf_counter()
+        POOL_CHECKED_OUT.inc()
+
+    @event.listens_for(engine, "checkin")
+    def _on_pool_checkin(dbapi_connection, connection_record):
+        started = connection_record.info.pop("checkout_started", None)
+        if started is not None:
+            POOL_HOLD_SECONDS.observe(time.perf_counter() - started)
+            POOL_CHECKED_OUT.dec()
+
+def _acquire_connection(session) -> None:
+    """Check the session's connection out now, timing the wait on the pool"""
+    if not PROMETHEUS_AVAILABLE:
+        return
+    # Sessions check out lazily on first execute; doing it here makes pool
+    # exhaustion (waits up to pool_timeout) show up in db_pool_acquire_seconds
+    started = time.perf_counter()
+    session.connection()
+    POOL_ACQUIRE_SECONDS.observe(time.perf_counter() - started)
 
 # Create session factory with proper SQLAlchemy 2.0 syntax
 SessionLocal = sessionmaker(
@@ -103,6 +233,61 @@ SessionLocal = sessionmaker(
     autocommit=False
 )
 
+# =============================================================================
+# ASYNC ENGINE (asyncpg) - OPTIONAL
+# =============================================================================
+
+def get_async_database_url():
+    """Get the asyncpg flavour of DATABASE_URL"""
+    for prefix in ('postgresql+psycopg2://', 'postgresql://'):
+        if DATABASE_URL.startswith(prefix):
+            return 'postgresql+asyncpg://' + DATABASE_URL[len(prefix):]
+    return DATABASE_URL
+
+# Created lazily so asyncpg stays an optional dependency
+_async_engine = None
+_AsyncSessionLocal = None
+
+def get_async_sessionmaker():
+    """Create (once) and return the async session factory"""
+    global _async_engine, _AsyncSessionLocal
+
+    if _AsyncSessionLocal is None:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+        if _USE_EXTERNAL_POOL:
+            # Same as the sync engine: pgbouncer pools, so no in-process pool.
+            # Transaction-mode pgbouncer also breaks asyncpg's prepared
+            # statement caches (statements outlive the server connection).
+            _async_engine = create_async_engine(
+                get_async_database_url(),
+                poolclass=NullPool,
+                pool_pre_ping=False,
+                connect_args={"statement_cache_size": 0, "prepared_statement_cache_size": 0},
+                echo=_DB_ECHO,
+                echo_pool=_DB_ECHO_POOL
+            )
+        else:
+            _async_engine = create_async_engine(
+                get_async_database_url(),
+                pool_size=db_config["pool_size"],
+                max_overflow=db_config["max_overflow"],
+                pool_timeout=db_config["pool_timeout"],
+                pool_recycle=db_config["pool_recycle"],
+                pool_pre_ping=db_config["pool_pre_ping"],
+                pool_use_lifo=db_config["pool_use_lifo"],
+                echo=_DB_ECHO,
+                echo_pool=_DB_ECHO_POOL
+            )
+        _AsyncSessionLocal = async_sessionmaker(
+            _async_engine,
+            expire_on_commit=False,
+            autoflush=False
+        )
+        logger.info("⚡ Async database engine (asyncpg) initialized")
+
+    return _AsyncSessionLocal
+
 # =============================================================================
 # ENHANCED DATABASE DEPENDENCY WITH PROPER ERROR HANDLING
 # =============================================================================
@@ -112,14 +297,20 @@ def get_db() -> Generator:
     db = None
     try:
         db = SessionLocal()
+        _acquire_connection(db)
         
-        if os.getenv("DB_DEBUG", "false").lower() == "true":
+        if _DB_DEBUG:
             log_pool_status()
         
         yield db
         
     except Exception as e:
-        logger.error(f"Database session error: {e}")
+        if isinstance(e, DBAPIError) and e.connection_invalidated:
+            # Without pre-ping a dead connection surfaces here once; SQLAlchemy
+            # has already invalidated the pool so the next request reconnects
+            logger.warning(f"⚠️ Stale database connection discarded: {e}")
+        else:
+            logger.error(f"Database session error: {e}")
         if db:
             try:
                 db.rollback()
@@ -138,6 +329,7 @@ def get_db_session():
     """Context manager for database sessions - MORE RELIABLE APPROACH"""
     session = SessionLocal()
     try:
+        _acquire_connection(session)
         yield session
         session.commit()
     except Exception as e:
@@ -147,24 +339,118 @@ def get_db_session():
     finally:
         session.close()
 
+async def get_async_db() -> AsyncGenerator:
+    """Async database dependency - no threadpool hop per request"""
+    async with get_async_sessionmaker()() as db:
+        try:
+            if _DB_DEBUG:
+                log_pool_status()
+
+            yield db
+
+        except Exception as e:
+            logger.error(f"Async database session error: {e}")
+            try:
+                await db.rollback()
+            except Exception as rollback_error:
+                logger.error(f"Failed to rollback transaction: {rollback_error}")
+            raise
+
+@asynccontextmanager
+async def get_async_db_session():
+    """Async context manager for database sessions"""
+    async with get_async_sessionmaker()() as session:
+        try:
+            yield session
+            await session.commit()
+        except Exception as e:
+            logger.error(f"Async database session error: {e}")
+            await session.rollback()
+            raise
+
 # =============================================================================
 # CONNECTION POOL MONITORING (SQLAlchemy 2.0 Compatible)
 # =============================================================================
 
-def get_pool_status():
-    """Get current connection pool status for monitoring"""
+# Admin console connection for pgbouncer stats (created on first use)
+_pgbouncer_admin_engine = None
+
+def get_pgbouncer_pools():
+    """Read SHOW POOLS from the pgbouncer admin console (PGBOUNCER_ADMIN_URL)"""
+    global _pgbouncer_admin_engine
+
+    admin_url = os.getenv("PGBOUNCER_ADMIN_URL")
+    if not admin_url:
+        return None
+
+    if _pgbouncer_admin_engine is None:
+        # The admin console does not support transactions
+        _pgbouncer_admin_engine = create_engine(
+            admin_url,
+            pool_size=1,
+            max_overflow=0,
+            isolation_level="AUTOCOMMIT"
+        )
+
+    with _pgbouncer_admin_engine.connect() as connection:
+        result = connection.execute(text("SHOW POOLS;"))
+        return [dict(row._mapping) for row in result]
+
+# Short-lived cache so health probes / logging don't hit the pool lock each time
+_POOL_STATUS_TTL = 1.0
+_pool_status_cache = None
+_pool_status_cached_at = 0.0
+_pool_status_lock = threading.Lock()
+
+def get_pool_status(fresh: bool = False):
+    """Get connection pool status for monitoring (cached for 1s unless fresh=True)"""
+    global _pool_status_cache, _pool_status_cached_at
+
+    now = time.monotonic()
+    with _pool_status_lock:
+        if not fresh and _pool_status_cache is not None and now - _pool_status_cached_at < _POOL_STATUS_TTL:
+            return _pool_status_cache
+
+    status = _read_pool_status()
+
+    # Don't cache failures - the next probe should retry
+    if "error" not in status:
+        with _pool_status_lock:
+            _pool_status_cache = status
+            _pool_status_cached_at = now
+
+    return status
+
+def _read_pool_status():
+    """Read the current pool status from the engine / pgbouncer"""
+    if _USE_EXTERNAL_POOL:
+        try:
+            return {
+                "pool_mode": "external",
+                "pgbouncer_pools": get_pgbouncer_pools(),
+                "environment": _ENVIRONMENT,
+                "sqlalchemy_version": "2.0.x",
+                "database_url_host": DATABASE_URL.split('@')[-1] if '@' in DATABASE_URL else "unknown"
+            }
+        except Exception as e:
+            logger.error(f"Failed to get pgbouncer pool status: {e}")
+            return {"error": str(e)}
+
     try:
         pool = engine.pool
+        cfg = get_database_config()
+        checked_in = pool.checkedin()
+        checked_out = pool.checkedout()
         return {
             "pool_size": pool.size(),
-            "checked_in": pool.checkedin(),
-            "checked_out": pool.checkedout(),
+            "checked_in": checked_in,
+            "checked_out": checked_out,
             "overflow": pool.overflow(),
-            "total_connections": pool.checkedout() + pool.checkedin(),
-            "max_connections": db_config["pool_size"] + db_config["max_overflow"],
-            "pool_timeout": db_config["pool_timeout"],
-            "pool_recycle": db_config["pool_recycle"],
-            "environment": os.getenv("ENVIRONMENT", "development"),
+            "total_connections": checked_out + checked_in,
+            "max_connections": cfg["pool_size"] + cfg["max_overflow"],
+            "pool_timeout": cfg["pool_timeout"],
+            "pool_recycle": cfg["pool_recycle"],
+            "environment": _ENVIRONMENT,
             "sqlalchemy_version": "2.0.x",
             "database_url_host": DATABASE_URL.split('@')[-1] if '@' in DATABASE_URL else "unknown"
         }
@@ -173,10 +459,15 @@ def get_pool_status():
         return {"error": str(e)}
 
 def log_pool_status():
-    """Log current pool status for monitoring"""
+    """Log current pool status for monitoring (Prometheus covers production)"""
+    if _ENVIRONMENT == "production" and not _DB_DEBUG:
+        return
+    
     try:
         status = get_pool_status()
-        if "error" not in status:
+        if status.get("pool_mode") == "external":
+            logger.info("🏊 DB Pool Status (v2.0): pooling handled externally (pgbouncer)")
+        elif "error" not in status:
             logger.info(f"🏊 DB Pool Status (v2.0): {status['checked_out']}/{status['max_connections']} connections in use")
             
             usage_percent = (status['checked_out'] / status['max_connections']) * 100
@@ -187,37 +478,105 @@ def log_pool_status():
     except Exception as e:
         logger.error(f"Failed to log pool status: {e}")
 
+# =============================================================================
+# POOL PRESSURE MONITORING
+# =============================================================================
+
+# max_overflow stays as configured (DB_MAX_OVERFLOW): QueuePool has no public
+# API to resize it at runtime. Sustained pressure is reported instead.
+POOL_MONITOR_INTERVAL = 5          # seconds between samples
+POOL_MONITOR_HIGH_WATERMARK = 0.8  # usage ratio that counts as "busy"
+POOL_MONITOR_WARN_AFTER = 6        # busy samples in a row (30s) before warning
+
+if PROMETHEUS_AVAILABLE:
+    POOL_USAGE_RATIO = Gauge(
+        "db_pool_usage_ratio",
+        "Checked-out DB connections as a fraction of pool_size + max_overflow"
+    )
+
+async def pool_pressure_monitor():
+    """Background task: export pool usage and warn when it stays near the limit"""
+    if _USE_EXTERNAL_POOL or not isinstance(engine.pool, QueuePool):
+        logger.info("🏊 Pool monitor disabled (no in-process QueuePool)")
+        return
+
+    busy_samples = 0
+
+    while True:
+        await asyncio.sleep(POOL_MONITOR_INTERVAL)
+        try:
+            status = get_pool_status(fresh=True)
+            if "error" in status:
+                continue
+
+            usage = status["checked_out"] / max(status["max_connections"], 1)
+            busy_samples = busy_samples + 1 if usage > POOL_MONITOR_HIGH_WATERMARK else 0
+
+            if busy_samples >= POOL_MONITOR_WARN_AFTER:
+                busy_samples = 0
+                logger.warning(
+                    f"📈 DB pool under sustained pressure ({usage:.0%} of {status['max_connections']}) "
+                    f"- consider raising DB_POOL_SIZE/DB_MAX_OVERFLOW"
+                )
+
+            if PROMETHEUS_AVAILABLE:
+                POOL_USAGE_RATIO.set(usage)
+
+        except Exception as e:
+            logger.error(f"Pool monitor error: {e}")
+
 # =============================================================================
 # DATABASE HEALTH CHECK FUNCTIONS (SQLAlchemy 2.0)
 # =============================================================================
 
-def test_connection_and_setup():
-    """Enhanced connection test with proper SQLAlchemy 2.0 syntax"""
+# Built once so the statement hits the engine's compiled cache on every probe
+_CONNECTION_PROBE = text("SELECT version(), current_database(), current_user")
+
+def test_connection_and_setup(create_schema: bool = False):
+    """
+    Enhanced connection test with proper SQLAlchemy 2.0 syntax.
+    With create_schema=True the tables are created/migrated on the same
+    connection and transaction, so startup needs a single checkout.
+    Returns False if the database can't be reached; schema creation or
+    migration errors are raised (like create_tables) rather than reported
+    as a failed connection.
+    """
+    in_schema_setup = False
     try:
         logger.info(f"🔍 Testing SQLAlchemy 2.0 database connection...")
         logger.info(f"📊 Pool Configuration: {db_config['pool_size']} base + {db_config['max_overflow']} overflow")
         
-        # SQLAlchemy 2.0 style connection test - FIXED transaction issue
-        with engine.connect() as connection:
-            # Test basic connectivity
-            result = connection.execute(text("SELECT version();"))
-            version = result.fetchone()[0]
-            
-            # Get database info in same connection
-            result = connection.execute(text("SELECT current_database(), current_user;"))
-            db_info = result.fetchone()
+        # SQLAlchemy 2.0 style connection test - one round trip for all probes
+        with engine.begin() as connection:
+            version, database_name, user = connection.execute(_CONNECTION_PROBE).fetchone()
             
             logger.info(f"✅ Database connected successfully with SQLAlchemy 2.0!")
             logger.info(f"📊 PostgreSQL version: {version}")
-            logger.info(f"🗄️ Database: {db_info[0]}")
-            logger.info(f"👤 User: {db_info[1]}")
+            logger.info(f"🗄️ Database: {database_name}")
+            logger.info(f"👤 User: {user}")
+            
+            if create_schema:
+                from .models import Base
+                
+                logger.info("📊 Creating database tables with SQLAlchemy 2.0...")
+                in_schema_setup = True
+                Base.metadata.create_all(bind=connection)
+                run_schema_migrations(connection)
+                in_schema_setup = False
+                logger.info("✅ Database tables created/verified successfully!")
             
-            pool_status = get_pool_status()
-            logger.info(f"🏊 Connection pool initialized: {pool_status['pool_size']} connections")
+            if _USE_EXTERNAL_POOL:
+                logger.info("🏊 Using external connection pool (NullPool in-process)")
+            else:
+                pool_status = get_pool_status()
+                logger.info(f"🏊 Connection pool initialized: {pool_status['pool_size']} connections")
             
             return True
             
     except Exception as e:
+        if in_schema_setup:
+            logger.error(f"❌ Database schema setup failed: {e}")
+            raise
         logger.error(f"❌ Database connection failed: {e}")
         logger.error(f"🔗 Connection URL: {DATABASE_URL.split('@')[0] if '@' in DATABASE_URL else 'Invalid URL'}@[HIDDEN]")
         return False
@@ -232,7 +591,9 @@ def create_tables():
         from .models import Base
         
         logger.info("📊 Creating database tables with SQLAlchemy 2.0...")
-        Base.metadata.create_all(bind=engine)
+        with engine.begin() as connection:
+            Base.metadata.create_all(bind=connection)
+            run_schema_migrations(connection)
         logger.info("✅ Database tables created/verified successfully!")
         
         # Log pool status after table creation
@@ -244,6 +605,82 @@ def create_tables():
         logger.error(f"❌ Failed to create tables: {e}")
         raise
 
+def migrate_generation_status_enum(connection):
+    """Convert music_generations.status from VARCHAR to the generation_status ENUM (idempotent)"""
+    from .models import GENERATION_STATUSES
+
+    column_type = connection.execute(text(
+        "SELECT udt_name FROM information_schema.columns "
+        "WHERE table_name = 'music_generations' AND column_name = 'status'"
+    )).scalar()
+
+    if column_type is None or column_type == "generation_status":
+        return False
+
+    logger.info("🔄 Migrating music_generations.status to ENUM generation_status...")
+    labels = ", ".join(f"'{status}'" for status in GENERATION_STATUSES)
+    # Older versions wrote other values (e.g. 'error'); the cast rejects them
+    legacy = connection.execute(text(
+        "UPDATE music_generations SET status = 'failed' "
+        f"WHERE status IS NULL OR status NOT IN ({labels})"
+    )).rowcount
+    if legacy:
+        logger.info(f"🔄 Normalized {legacy} legacy status values to 'failed'")
+    connection.execute(text(
+        "DO $$ BEGIN "
+        f"CREATE TYPE generation_status AS ENUM ({labels}); "
+        "EXCEPTION WHEN duplicate_object THEN NULL; END $$;"
+    ))
+    connection.execute(text(
+        "ALTER TABLE music_generations "
+        "ALTER COLUMN status TYPE generation_status USING status::generation_status"
+    ))
+    logger.info("✅ music_generations.status migrated to ENUM")
+    return True
+
+def migrate_usage_stats_success_rate(connection):
+    """Add usage_stats.success_rate as a stored generated column (idempotent)"""
+    from .models import USAGE_SUCCESS_RATE_SQL
+
+    connection.execute(text(
+        "ALTER TABLE usage_stats ADD COLUMN IF NOT EXISTS success_rate DOUBLE PRECISION "
+        f"GENERATED ALWAYS AS ({USAGE_SUCCESS_RATE_SQL}) STORED"
+    ))
+
+def migrate_generation_prompt_tsv(connection):
+    """Add music_generations.prompt_tsv as a stored generated tsvector column (idempotent)"""
+    from .models import PROMPT_TSV_SQL
+
+    connection.execute(text(
+        "ALTER TABLE music_generations ADD COLUMN IF NOT EXISTS prompt_tsv tsvector "
+        f"GENERATED ALWAYS AS ({PROMPT_TSV_SQL}) STORED"
+    ))
+
+def migrate_missing_indexes(connection):
+    """Create indexes declared on the models but missing from existing tables"""
+    from .models import Base
+
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=connection, checkfirst=True)
+
+def drop_obsolete_indexes(connection):
+    """Drop indexes that have been replaced by newer definitions (idempotent)"""
+    from .models import OBSOLETE_INDEXES
+
+    for index_name in OBSOLETE_INDEXES:
+        connection.execute(text(f"DROP INDEX IF EXISTS {index_name}"))
+
+def run_schema_migrations(connection):
+    """Bring tables created by older versions up to the current schema"""
+    # DDL on large tables can outlast the per-connection statement_timeout
+    connection.execute(text("SET LOCAL statement_timeout = 0"))
+    migrate_generation_status_enum(connection)
+    migrate_usage_stats_success_rate(connection)
+    migrate_generation_prompt_tsv(connection)
+    migrate_missing_indexes(connection)
+    drop_obsolete_indexes(connection)
+
 # =============================================================================
 # STARTUP VALIDATION
 # =============================================================================
@@ -252,13 +689,12 @@ def validate_database_config():
     """Validate database configuration on startup"""
     logger.info("🔍 Validating SQLAlchemy 2.0 database configuration...")
     
-    env = os.getenv("ENVIRONMENT", "development")
-    logger.info(f"🌍 Environment: {env}")
+    logger.info(f"🌍 Environment: {_ENVIRONMENT}")
     logger.info(f"🔧 SQLAlchemy: 2.0.x (future=True)")
     logger.info(f"🏊 Pool size: {db_config['pool_size']} + {db_config['max_overflow']} overflow")
     logger.info(f"⏰ Pool timeout: {db_config['pool_timeout']}s")
     logger.info(f"♻️ Pool recycle: {db_config['pool_recycle']}s")
-    logger.info(f"🏥 Pre-ping enabled: {db_config['pool_pre_ping']}")
+    logger.info(f"🏥 Pre-ping enabled: {db_config['pool_pre_ping']} (TCP keepalive: {bool(db_config['connect_args'].get('keepalives'))})")
     
     # Validate configuration values
     if db_config["pool_size"] <= 0:
@@ -3,13 +3,23 @@
 # File: database/models.py - COMPLETELY REWRITTEN FOR CONSISTENCY
 # =============================================================================
 
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, Index
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, Index, Enum, Computed, update, bindparam, text
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import deferred
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.sql import func
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterable, Mapping
+import json
 import os
 
+# Optional: msgspec encodes the list endpoints' responses straight to JSON bytes in C
+try:
+    import msgspec
+    MSGSPEC_AVAILABLE = True
+except ImportError:
+    MSGSPEC_AVAILABLE = False
+
 Base = declarative_base()
 
 # =============================================================================
@@ -20,7 +30,7 @@ class User(Base):
     """User model with proper constraints and relationships"""
     __tablename__ = "users"
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     username = Column(String(50), unique=True, index=True, nullable=False)
     email = Column(String(100), unique=True, index=True, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -40,14 +50,39 @@ class User(Base):
             "id": self.id,
             "username": self.username,
             "email": self.email,
-            "created_at": self.created_at.isoformat() if self.created_at else None,
-            "last_active": self.last_active.isoformat() if self.last_active else None,
+            "created_at": self.created_at,
+            "last_active": self.last_active,
             "is_active": self.is_active,
             "preferred_device": self.preferred_device,
             "preferred_precision": self.preferred_precision,
             "default_duration": self.default_duration
         }
 
+# =============================================================================
+# GENERATION STATUS ENUM
+# =============================================================================
+
+# Stored as a native PostgreSQL ENUM (4 bytes) instead of VARCHAR. device and
+# precision stay VARCHAR because they come straight from the request.
+GENERATION_STATUSES = ('processing', 'completed', 'failed')
+GenerationStatus = Enum(*GENERATION_STATUSES, name='generation_status')
+
+# Full-text search vector for prompts - generated column backed by a GIN index
+PROMPT_TSV_SQL = "to_tsvector('english', coalesce(prompt, ''))"
+
+# Columns the list endpoints (recent/favorites/most-played/search) return, in
+# to_dict() order: everything the frontend's Generation type requires.
+# idx_generations_list_include carries all of them except the unbounded
+# prompt/audio_url text (a B-tree entry is capped at ~2.7KB, and a long prompt
+# would make the INSERT fail), so list queries fetch only those two from the heap.
+GENERATION_LIST_FIELDS = (
+    'id', 'generation_id', 'prompt', 'status',
+    'device', 'precision', 'generation_time', 'realtime_factor',
+    'audio_url', 'file_size_mb', 'duration', 'sample_rate',
+    'play_count', 'download_count', 'is_favorited', 'last_played',
+    'created_at'
+)
+
 # =============================================================================
 # FIXED MUSIC GENERATION MODEL - CONSISTENT FIELD NAMES
 # =============================================================================
@@ -60,12 +95,13 @@ class MusicGeneration(Base):
     __tablename__ = "music_generations"
     
     # Primary fields
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     generation_id = Column(String(100), unique=True, index=True, nullable=False)
     prompt = Column(Text, nullable=False)
+    prompt_tsv = deferred(Column(TSVECTOR, Computed(PROMPT_TSV_SQL, persisted=True)))  # search only, not loaded by default
     
     # Generation metadata - STANDARDIZED NAMES
-    status = Column(String(20), default='processing', nullable=False, index=True)
+    status = Column(GenerationStatus, default='processing', nullable=False)  # indexed via idx_generations_list_include
     device = Column(String(50), nullable=False)  # NO MORE device_used
     precision = Column(String(20), default='float32', nullable=False)
     generation_time = Column(Float, nullable=False)  # NO MORE total_time
@@ -93,11 +129,53 @@ class MusicGeneration(Base):
     error_message = Column(Text, nullable=True)  # For failed generations
     model_version = Column(String(50), default='musicgen-small', nullable=False)
     
+    # Composite indexes for common queries
+    __table_args__ = (
+        # Covering index for the list views (status filter + newest first) so
+        # the hot list columns can be served by an index-only scan
+        Index(
+            'idx_generations_list_include',
+            status,
+            created_at.desc(),
+            postgresql_include=[
+                name for name in GENERATION_LIST_FIELDS
+                if name not in ('status', 'created_at', 'prompt', 'audio_url')
+            ]
+        ),
+        # Stats aggregates (completed rows in a date window, grouped by device)
+        Index(
+            'idx_generations_status_created_device',
+            status,
+            created_at,
+            device,
+            postgresql_include=[
+                'generation_time', 'realtime_factor', 'file_size_mb',
+                'play_count', 'download_count', 'is_favorited'
+            ]
+        ),
+        # Partial indexes matching the favorites / most-played list filters,
+        # so ORDER BY ... LIMIT reads the first N index entries and stops
+        Index(
+            'idx_generations_favorites_created',
+            created_at.desc(),
+            postgresql_where=text("is_favorited AND status = 'completed'")
+        ),
+        Index(
+            'idx_generations_completed_play_count',
+            play_count.desc(),
+            postgresql_where=text("status = 'completed'")
+        ),
+        Index('idx_generations_prompt_tsv', prompt_tsv, postgresql_using='gin'),
+    )
+    
     def __repr__(self):
         return f"<MusicGeneration(id={self.id}, generation_id='{self.generation_id}', status='{self.status}')>"
     
     def to_dict(self) -> Dict[str, Any]:
-        """Convert to dictionary with CONSISTENT field names"""
+        """
+        Convert to dictionary with CONSISTENT field names.
+        Datetimes are returned as-is; the JSON layer (orjson) serializes them.
+        """
         return {
             "id": self.id,
             "generation_id": self.generation_id,
@@ -121,11 +199,11 @@ class MusicGeneration(Base):
             "play_count": self.play_count,
             "download_count": self.download_count,
             "is_favorited": self.is_favorited,
-            "last_played": self.last_played.isoformat() if self.last_played else None,
+            "last_played": self.last_played,
             
             # Timestamps
-            "created_at": self.created_at.isoformat() if self.created_at else None,
-            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
             
             # Optional fields
             "user_id": self.user_id,
@@ -134,11 +212,13 @@ class MusicGeneration(Base):
         }
     
     def calculate_actual_file_size(self) -> float:
-        """Calculate actual file size from file system"""
-        if self.file_path and os.path.exists(self.file_path):
-            size_bytes = os.path.getsize(self.file_path)
-            size_mb = size_bytes / (1024 * 1024)
-            return round(size_mb, 2)
+        """Calculate actual file size from file system (single stat call)"""
+        if self.file_path:
+            try:
+                size_bytes = os.stat(self.file_path).st_size
+            except OSError:
+                return 0.0
+            return round(size_bytes / (1024 * 1024), 2)
         return 0.0
     
     def update_file_size(self) -> None:
@@ -147,35 +227,85 @@ class MusicGeneration(Base):
         if actual_size > 0:
             self.file_size_mb = actual_size
     
-    def increment_play_count(self) -> None:
-        """Increment play count and update last_played"""
-        self.play_count += 1
-        self.last_played = datetime.utcnow()
-    
-    def increment_download_count(self) -> None:
-        """Increment download count"""
-        self.download_count += 1
+    @classmethod
+    def toggle_favorite_sql(cls, session, generation_id: str) -> Optional[bool]:
+        """Atomically flip is_favorited; returns the new status or None"""
+        return session.execute(_TOGGLE_FAVORITE, {'gid': generation_id}).scalar_one_or_none()
     
     def toggle_favorite(self) -> bool:
         """Toggle favorite status and return new status"""
         self.is_favorited = not self.is_favorited
         return self.is_favorited
 
+# Hot-path UPDATE ... RETURNING statement, built once so every call reuses
+# the engine's compiled-statement cache; only the generation id is bound
+_BY_GENERATION_ID = MusicGeneration.generation_id == bindparam('gid')
+
+_TOGGLE_FAVORITE = (
+    update(MusicGeneration)
+    .where(_BY_GENERATION_ID)
+    .values(is_favorited=~MusicGeneration.is_favorited)
+    .returning(MusicGeneration.is_favorited)
+    .execution_options(synchronize_session=False)
+)
+
+# Columns exposed by to_dict(), in the same order. List queries select just
+# these, so each row comes back as a plain mapping and dict(row) == to_dict()
+# without building ORM instances.
+GENERATION_DICT_FIELDS = (
+    'id', 'generation_id', 'prompt', 'status',
+    'device', 'precision', 'generation_time', 'realtime_factor',
+    'file_path', 'audio_url', 'file_size_mb', 'duration', 'sample_rate',
+    'play_count', 'download_count', 'is_favorited', 'last_played',
+    'created_at', 'updated_at',
+    'user_id', 'error_message', 'model_version'
+)
+GENERATION_DICT_COLUMNS = tuple(MusicGeneration.__table__.c[name] for name in GENERATION_DICT_FIELDS)
+GENERATION_LIST_COLUMNS = tuple(MusicGeneration.__table__.c[name] for name in GENERATION_LIST_FIELDS)
+
+# =============================================================================
+# FAST SERIALIZATION FOR GENERATION LISTS
+# =============================================================================
+
+if MSGSPEC_AVAILABLE:
+    _generation_encoder = msgspec.json.Encoder()
+
+def _json_default(value):
+    """json.dumps fallback for the datetimes in list rows"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def encode_generations(generations: Iterable[Mapping[str, Any]], **extra: Any) -> bytes:
+    """
+    Encode a list endpoint's {"success": True, "data": [...], **extra} body to
+    JSON bytes. msgspec serializes the row dicts (datetimes included) in C,
+    skipping FastAPI's jsonable_encoder walk over every field.
+    """
+    payload = {"success": True, "data": list(generations), **extra}
+    if MSGSPEC_AVAILABLE:
+        return _generation_encoder.encode(payload)
+    return json.dumps(payload, default=_json_default).encode("utf-8")
+
 # =============================================================================
 # USAGE STATISTICS MODEL - FOR ANALYTICS
 # =============================================================================
 
+# Generated column expression - computed by Postgres on write, not per read
+USAGE_SUCCESS_RATE_SQL = "(successful_generations * 100.0) / GREATEST(total_generations, 1)"
+
 class UsageStats(Base):
     """Usage statistics for analytics"""
     __tablename__ = "usage_stats"
     
-    id = Column(Integer, primary_key=True, index=True)
-    date = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+    id = Column(Integer, primary_key=True)
+    date = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     
     # Daily counts
     total_generations = Column(Integer, default=0, nullable=False)
     successful_generations = Column(Integer, default=0, nullable=False)
     failed_generations = Column(Integer, default=0, nullable=False)
+    success_rate = Column(Float, Computed(USAGE_SUCCESS_RATE_SQL, persisted=True))
     
     # Performance metrics
     avg_generation_time = Column(Float, default=0.0, nullable=False)
@@ -187,17 +317,21 @@ class UsageStats(Base):
     total_favorites = Column(Integer, default=0, nullable=False)
     unique_users = Column(Integer, default=0, nullable=False)
     
+    __table_args__ = (
+        Index('idx_usage_stats_date', date.desc()),
+    )
+    
     def __repr__(self):
         return f"<UsageStats(date={self.date}, total_generations={self.total_generations})>"
     
     def to_dict(self) -> Dict[str, Any]:
         return {
             "id": self.id,
-            "date": self.date.isoformat() if self.date else None,
+            "date": self.date,
             "total_generations": self.total_generations,
             "successful_generations": self.successful_generations,
             "failed_generations": self.failed_generations,
-            "success_rate": (self.successful_generations / max(self.total_generations, 1)) * 100,
+            "success_rate": self.success_rate,
             "avg_generation_time": self.avg_generation_time,
             "avg_realtime_factor": self.avg_realtime_factor,
             "total_plays": self.total_plays,
@@ -214,8 +348,8 @@ class SystemMetrics(Base):
     """System performance metrics"""
     __tablename__ = "system_metrics"
     
-    id = Column(Integer, primary_key=True, index=True)
-    timestamp = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+    id = Column(Integer, primary_key=True)
+    timestamp = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     
     # System resources
     cpu_usage = Column(Float, nullable=True)
@@ -234,13 +368,17 @@ class SystemMetrics(Base):
     error_rate = Column(Float, default=0.0, nullable=False)
     requests_per_minute = Column(Integer, default=0, nullable=False)
     
+    __table_args__ = (
+        Index('idx_system_metrics_timestamp', timestamp.desc()),
+    )
+    
     def __repr__(self):
         return f"<SystemMetrics(timestamp={self.timestamp}, cpu_usage={self.cpu_usage})>"
     
     def to_dict(self) -> Dict[str, Any]:
         return {
             "id": self.id,
-            "timestamp": self.timestamp.isoformat() if self.timestamp else None,
+            "timestamp": self.timestamp,
             "cpu_usage": self.cpu_usage,
             "memory_usage": self.memory_usage,
             "gpu_usage": self.gpu_usage,
@@ -255,59 +393,56 @@ class SystemMetrics(Base):
         }
 
 # =============================================================================
-# DATABASE INDEXES FOR PERFORMANCE
+# VALIDATION FUNCTIONS
 # =============================================================================
 
-# Create composite indexes for common queries
-Index('idx_generations_status_created', MusicGeneration.status, MusicGeneration.created_at.desc())
-Index('idx_generations_favorited_created', MusicGeneration.is_favorited, MusicGeneration.created_at.desc())
-Index('idx_generations_play_count_desc', MusicGeneration.play_count.desc())
-Index('idx_usage_stats_date', UsageStats.date.desc())
-Index('idx_system_metrics_timestamp', SystemMetrics.timestamp.desc())
+# Built once at import instead of on every insert
+_REQUIRED_GENERATION_FIELDS = (
+    ('generation_id', str),
+    ('prompt', str),
+    ('device', str),
+    ('generation_time', float),
+    ('file_size_mb', float),
+)
 
-# =============================================================================
-# VALIDATION FUNCTIONS
-# =============================================================================
+_GENERATION_DEFAULTS = (
+    ('status', 'completed'),
+    ('precision', 'float32'),
+    ('realtime_factor', 1.0),
+    ('duration', 30.0),
+    ('sample_rate', 32000),
+    ('play_count', 0),
+    ('download_count', 0),
+    ('is_favorited', False),
+    ('model_version', 'musicgen-small'),
+)
 
 def validate_generation_data(data: Dict[str, Any]) -> Dict[str, Any]:
     """Validate and clean generation data before database insertion"""
     
     # Ensure required fields exist
-    required_fields = {
-        'generation_id': str,
-        'prompt': str,
-        'device': str,
-        'generation_time': float,
-        'file_size_mb': float
-    }
-    
-    for field, expected_type in required_fields.items():
+    for field, expected_type in _REQUIRED_GENERATION_FIELDS:
         if field not in data:
             raise ValueError(f"Missing required field: {field}")
         
-        if not isinstance(data[field], expected_type):
+        value = data[field]
+        # Fast path: exact type match needs no conversion
+        if type(value) is not expected_type and not isinstance(value, expected_type):
             try:
-                data[field] = expected_type(data[field])
+                data[field] = expected_type(value)
             except (ValueError, TypeError):
                 raise ValueError(f"Invalid type for {field}: expected {expected_type.__name__}")
     
     # Set defaults for optional fields
-    defaults = {
-        'status': 'completed',
-        'precision': 'float32',
-        'realtime_factor': 1.0,
-        'duration': 30.0,
-        'sample_rate': 32000,
-        'play_count': 0,
-        'download_count': 0,
-        'is_favorited': False,
-        'model_version': 'musicgen-small'
-    }
-    
-    for field, default_value in defaults.items():
-        if field not in data or data[field] is None:
+    for field, default_value in _GENERATION_DEFAULTS:
+        if data.get(field) is None:
             data[field] = default_value
     
+    # Failed generations are recorded with zero time/size; only completed
+    # records must have real measurements
+    if data['status'] != 'completed':
+        return data
+    
     # Validate ranges
     if data['generation_time'] <= 0:
         raise ValueError("generation_time must be positive")
@@ -333,5 +468,13 @@ class SchemaVersion(Base):
     applied_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     description = Column(Text, nullable=True)
 
+# Indexes superseded by newer ones; dropped by run_schema_migrations
+OBSOLETE_INDEXES = (
+    'idx_generations_favorited_created',
+    'idx_generations_play_count_desc',
+    'idx_generations_status_created',  # replaced by idx_generations_list_include
+    'idx_generations_list_covering',  # INCLUDEd the unbounded prompt/audio_url columns
+)
+
 # Current schema version
-CURRENT_SCHEMA_VERSION = "2.1.0"
\ No newline at end of file
+CURRENT_SCHEMA_VERSION = "2.2.0"
\ No newline at end of file
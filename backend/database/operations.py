@@ -3,16 +3,171 @@
 # File: database/operations.py - REWRITTEN FOR RELIABILITY AND CONSISTENCY
 # =============================================================================
 
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, func, and_, or_, text
-from typing import List, Dict, Any, Optional, Tuple
-from datetime import datetime, timedelta
+from sqlalchemy.orm import Session, load_only
+from sqlalchemy import select, delete, desc, func, and_, or_, text, case, update, bindparam
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from typing import List, Dict, Any, NamedTuple, Optional, Tuple
+from collections import defaultdict, Counter, deque
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import atexit
+import csv
+import io
 import logging
+import time
 import os
-from .models import MusicGeneration, User, UsageStats, SystemMetrics, validate_generation_data
+from .models import (
+    MusicGeneration, User, UsageStats, SystemMetrics, validate_generation_data,
+    GENERATION_DICT_COLUMNS, GENERATION_LIST_COLUMNS
+)
 
 logger = logging.getLogger(__name__)
 
+# Optional Prometheus gauge for the play/download buffer
+try:
+    from prometheus_client import Gauge
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+# Buffered system-metric samples (flushed in batches by record_system_metrics)
+METRICS_FLUSH_SIZE = 100
+METRICS_FLUSH_INTERVAL = 10.0  # seconds
+METRICS_COPY_THRESHOLD = METRICS_FLUSH_SIZE  # full buffers go through COPY; timed partial flushes use INSERT
+_metrics_buffer = deque()
+_metrics_lock = threading.Lock()
+_metrics_last_flush = time.monotonic()
+
+# Buffered play/download counters, written by a background writer thread
+INTERACTION_FLUSH_SIZE = 500
+INTERACTION_FLUSH_INTERVAL = 0.2  # seconds
+INTERACTION_BUFFER_LIMIT = 50000  # events held in memory at most; further events are dropped
+INTERACTION_MAX_FLUSH_FAILURES = 3  # consecutive failed flushes before the pending counts are dropped
+_play_buffer = Counter()
+_download_buffer = Counter()
+_pending_interactions = 0
+_dropped_interactions = 0
+_interaction_flush_failures = 0
+_interaction_lock = threading.Lock()
+_interaction_wakeup = threading.Event()
+_interaction_writer = None
+_writer_start_lock = threading.Lock()
+
+if PROMETHEUS_AVAILABLE:
+    INTERACTION_EVENTS_PENDING = Gauge(
+        "interaction_events_pending",
+        "Play/download events buffered and not yet written to the database"
+    )
+    INTERACTION_EVENTS_PENDING.set_function(lambda: _pending_interactions)
+
+_FLUSH_PLAYS = text(
+    "UPDATE music_generations AS g "
+    "SET play_count = g.play_count + v.delta, last_played = now(), updated_at = now() "
+    "FROM unnest(CAST(:gids AS text[]), CAST(:deltas AS integer[])) AS v(gid, delta) "
+    "WHERE g.generation_id = v.gid"
+)
+_FLUSH_DOWNLOADS = text(
+    "UPDATE music_generations AS g "
+    "SET download_count = g.download_count + v.delta, updated_at = now() "
+    "FROM unnest(CAST(:gids AS text[]), CAST(:deltas AS integer[])) AS v(gid, delta) "
+    "WHERE g.generation_id = v.gid"
+)
+
+# Prompt search, built once so it is compiled once and served from the
+# engine's statement cache; websearch_to_tsquery understands "phrases" and -negation
+_SEARCH_STMT = (
+    select(*GENERATION_LIST_COLUMNS)
+    .where(and_(
+        MusicGeneration.status == 'completed',
+        MusicGeneration.prompt_tsv.op('@@')(func.websearch_to_tsquery('english', bindparam('q')))
+    ))
+    .order_by(desc(MusicGeneration.created_at))
+    .limit(bindparam('lim'))
+)
+
+# /analytics/performance aggregates: one scan of the period, metrics only for
+# successful generations (same FILTER predicates as get_generation_stats)
+_perf_completed = and_(MusicGeneration.status == 'completed', MusicGeneration.created_at >= bindparam('since'))
+_PERF_STATS_STMT = (
+    select(
+        func.coalesce(func.avg(MusicGeneration.generation_time).filter(_perf_completed), 0.0).label('avg_time'),
+        func.count().label('total'),
+        func.count().filter(_perf_completed).label('ok'),
+        func.coalesce(func.avg(MusicGeneration.realtime_factor).filter(_perf_completed), 0.0).label('avg_rtf'),
+        func.coalesce(func.sum(MusicGeneration.play_count).filter(_perf_completed), 0).label('plays'),
+        func.coalesce(func.sum(MusicGeneration.download_count).filter(_perf_completed), 0).label('downloads')
+    )
+    .where(MusicGeneration.created_at >= bindparam('since'))
+)
+
+class PerfStats(NamedTuple):
+    """Row returned by DatabaseOperations.get_perf_stats_v2 (zeros for an empty period)"""
+    avg_time: float
+    total: int
+    success_rate: float
+    avg_rtf: float
+    plays: int
+    downloads: int
+    avg_plays: float
+
+CLEANUP_FILE_WORKERS = 8
+
+def _file_size_mb(file_path: str) -> Optional[float]:
+    """Size of a file in MB, or None if it doesn't exist"""
+    try:
+        return round(os.stat(file_path).st_size / (1024 * 1024), 2)
+    except OSError:
+        return None
+
+def _remove_file(file_path: str) -> bool:
+    """Delete a file, returning True if it was removed"""
+    try:
+        os.remove(file_path)
+        return True
+    except FileNotFoundError:
+        return False
+    except OSError as e:
+        logger.warning(f"⚠️ Failed to delete file {file_path}: {e}")
+        return False
+
+# Dashboard queries (stats/health) change slowly - cache them per process
+STATS_CACHE_TTL = 30.0  # seconds
+STATS_CACHE_MAX_ENTRIES = 64
+
+def _ttl_cached(func):
+    """
+    Cache a DatabaseOperations query for STATS_CACHE_TTL seconds, keyed by its
+    arguments (the session is ignored). Pass refresh=True to bypass the cache.
+    Results containing an "error" key are never cached.
+    """
+    cache = {}
+    lock = threading.RLock()
+    
+    @wraps(func)
+    def wrapper(session, *args, refresh: bool = False, **kwargs):
+        key = (args, tuple(sorted(kwargs.items())))
+        now = time.monotonic()
+        
+        if not refresh:
+            with lock:
+                entry = cache.get(key)
+                if entry is not None and now - entry[0] < STATS_CACHE_TTL:
+                    return entry[1]
+        
+        result = func(session, *args, **kwargs)
+        
+        if "error" not in result:
+            with lock:
+                if len(cache) >= STATS_CACHE_MAX_ENTRIES:
+                    cache.clear()
+                cache[key] = (now, result)
+        
+        return result
+    
+    return wrapper
+
 # =============================================================================
 # ENHANCED DATABASE OPERATIONS CLASS
 # =============================================================================
@@ -36,10 +191,9 @@ class DatabaseOperations:
             # Validate and clean input data
             clean_data = validate_generation_data(generation_data)
             
-            # Calculate actual file size if file exists
-            if file_path and os.path.exists(file_path):
-                size_bytes = os.path.getsize(file_path)
-                actual_size_mb = round(size_bytes / (1024 * 1024), 2)
+            # Calculate actual file size if file exists (one stat call)
+            actual_size_mb = _file_size_mb(file_path) if file_path else None
+            if actual_size_mb is not None:
                 clean_data['file_size_mb'] = actual_size_mb
                 clean_data['file_path'] = file_path
                 
@@ -80,10 +234,9 @@ class DatabaseOperations:
             session.commit()
             session.refresh(generation)
             
-            logger.info(f"✅ Created generation record: {generation.generation_id} "
-                       f"(device: {generation.device}, "
-                       f"time: {generation.generation_time:.1f}s, "
-                       f"size: {generation.file_size_mb:.1f}MB)")
+            logger.info("✅ Created generation record: %s (device: %s, time: %.1fs, size: %.1fMB)",
+                        generation.generation_id, generation.device,
+                        generation.generation_time, generation.file_size_mb)
             
             return generation
             
@@ -92,6 +245,76 @@ class DatabaseOperations:
             session.rollback()
             return None
     
+    @staticmethod
+    def _prepare_generation_rows(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Validate generation dicts for a multi-row INSERT.
+        Invalid rows are skipped; every returned row has the same keys.
+        """
+        columns = set(MusicGeneration.__table__.columns.keys())
+        clean_rows = []
+        
+        for row in rows:
+            try:
+                clean_data = validate_generation_data(dict(row))
+            except ValueError as e:
+                logger.warning(f"⚠️ Skipping invalid generation {row.get('generation_id')}: {e}")
+                continue
+            
+            if clean_data.get('file_path') and not clean_data.get('audio_url'):
+                clean_data['audio_url'] = f"/audio/{os.path.basename(clean_data['file_path'])}"
+            
+            clean_rows.append({key: value for key, value in clean_data.items() if key in columns})
+        
+        if not clean_rows:
+            return clean_rows
+        
+        # A multi-row VALUES clause needs the same keys in every row: fill gaps
+        # in nullable columns with NULL and leave server-defaulted ones to the DB
+        table_columns = MusicGeneration.__table__.columns
+        all_keys = set().union(*clean_rows)
+        partial_keys = {key for key in all_keys if any(key not in row for row in clean_rows)}
+        for key in partial_keys:
+            if table_columns[key].nullable:
+                for row in clean_rows:
+                    row.setdefault(key, None)
+            else:
+                for row in clean_rows:
+                    row.pop(key, None)
+        
+        return clean_rows
+    
+    @staticmethod
+    def bulk_insert_generations(
+        session: Session,
+        rows: List[Dict[str, Any]]
+    ) -> int:
+        """
+        Insert many generation records in one multi-row INSERT.
+        Rows that fail validation are skipped; duplicate generation_ids are ignored.
+        Returns the number of rows inserted.
+        """
+        clean_rows = DatabaseOperations._prepare_generation_rows(rows)
+        
+        if not clean_rows:
+            return 0
+        
+        try:
+            result = session.execute(
+                pg_insert(MusicGeneration.__table__)
+                .values(clean_rows)
+                .on_conflict_do_nothing(index_elements=['generation_id'])
+            )
+            session.commit()
+            
+            logger.info(f"✅ Bulk inserted {result.rowcount}/{len(rows)} generation records")
+            return result.rowcount
+            
+        except Exception as e:
+            logger.error(f"❌ Failed to bulk insert generation records: {e}")
+            session.rollback()
+            return 0
+    
     @staticmethod
     def get_recent_generations(
         session: Session, 
@@ -102,27 +325,18 @@ class DatabaseOperations:
         FIXED: Get recent generations with consistent data structure
         """
         try:
-            query = session.query(MusicGeneration)
+            stmt = select(*GENERATION_LIST_COLUMNS)
             
             if not include_failed:
-                query = query.filter(MusicGeneration.status == 'completed')
+                stmt = stmt.where(MusicGeneration.status == 'completed')
             
-            generations = query.order_by(desc(MusicGeneration.created_at)).limit(limit).all()
+            rows = session.execute(
+                stmt.order_by(desc(MusicGeneration.created_at)).limit(limit)
+            ).mappings().all()
             
-            # Convert to dictionaries with CONSISTENT field names
-            result = []
-            for gen in generations:
-                data = gen.to_dict()
-                
-                # Ensure file size is accurate
-                if gen.file_path and os.path.exists(gen.file_path):
-                    actual_size = gen.calculate_actual_file_size()
-                    if actual_size != gen.file_size_mb:
-                        gen.file_size_mb = actual_size
-                        session.commit()
-                        data['file_size_mb'] = actual_size
-                
-                result.append(data)
+            # List columns only (idx_generations_list_include). Stored sizes
+            # are served as-is; drift is reconciled by refresh_all_file_sizes in the background
+            result = [dict(row) for row in rows]
             
             logger.info(f"📚 Retrieved {len(result)} recent generations")
             return result
@@ -131,22 +345,94 @@ class DatabaseOperations:
             logger.error(f"❌ Failed to get recent generations: {e}")
             return []
     
+    @staticmethod
+    def get_by_generation_id(session: Session, generation_id: str) -> Optional[Dict[str, Any]]:
+        """Single generation by its generation_id (unique index lookup), or None"""
+        try:
+            row = session.execute(
+                select(*GENERATION_DICT_COLUMNS)
+                .where(MusicGeneration.generation_id == generation_id)
+            ).mappings().first()
+            return dict(row) if row is not None else None
+            
+        except Exception as e:
+            logger.error(f"❌ Failed to get generation {generation_id}: {e}")
+            return None
+    
+    @staticmethod
+    def scan_file_sizes(directories) -> Dict[str, float]:
+        """Map file path -> size in MB with one os.scandir pass per directory"""
+        sizes = {}
+        for directory in directories:
+            try:
+                with os.scandir(directory or '.') as entries:
+                    for entry in entries:
+                        if entry.is_file():
+                            sizes[entry.path] = round(entry.stat().st_size / (1024 * 1024), 2)
+            except OSError as e:
+                logger.warning(f"⚠️ Could not scan {directory}: {e}")
+        return sizes
+    
+    @staticmethod
+    def refresh_all_file_sizes(session: Session) -> int:
+        """
+        Recompute file_size_mb for every generation with a file on disk.
+        One scandir per directory and a single UPDATE ... CASE for all changes.
+        Returns the number of rows updated.
+        """
+        try:
+            rows = (
+                session.query(MusicGeneration.id, MusicGeneration.file_path, MusicGeneration.file_size_mb)
+                .filter(MusicGeneration.file_path.isnot(None))
+                .all()
+            )
+            
+            by_directory = defaultdict(list)
+            for row in rows:
+                by_directory[os.path.dirname(row.file_path)].append(row)
+            
+            sizes = DatabaseOperations.scan_file_sizes(by_directory)
+            
+            changed = {}
+            for directory, dir_rows in by_directory.items():
+                for row in dir_rows:
+                    # scandir yields paths joined onto the directory as given
+                    actual_size = sizes.get(os.path.join(directory or '.', os.path.basename(row.file_path)))
+                    if actual_size is not None and actual_size != row.file_size_mb:
+                        changed[row.id] = actual_size
+            
+            if changed:
+                session.execute(
+                    update(MusicGeneration)
+                    .where(MusicGeneration.id.in_(changed.keys()))
+                    .values(file_size_mb=case(changed, value=MusicGeneration.id))
+                    .execution_options(synchronize_session=False)
+                )
+                session.commit()
+            
+            logger.info(f"📁 Refreshed file sizes: {len(changed)} of {len(rows)} records updated")
+            return len(changed)
+            
+        except Exception as e:
+            logger.error(f"❌ Failed to refresh file sizes: {e}")
+            session.rollback()
+            return 0
+    
     @staticmethod
     def get_most_played(session: Session, limit: int = 10) -> List[Dict[str, Any]]:
         """Get most played generations"""
         try:
-            generations = (
-                session.query(MusicGeneration)
-                .filter(and_(
+            rows = session.execute(
+                select(*GENERATION_LIST_COLUMNS)
+                .where(and_(
                     MusicGeneration.status == 'completed',
                     MusicGeneration.play_count > 0
                 ))
                 .order_by(desc(MusicGeneration.play_count))
                 .limit(limit)
-                .all()
-            )
+            ).mappings().all()
             
-            result = [gen.to_dict() for gen in generations]
+            result = [dict(row) for row in rows]
             logger.info(f"🔥 Retrieved {len(result)} most played generations")
             return result
             
@@ -154,41 +440,58 @@ class DatabaseOperations:
             logger.error(f"❌ Failed to get most played: {e}")
             return []
     
+    @staticmethod
+    def list_generation_rows(
+        session: Session,
+        fields: Tuple[str, ...],
+        limit: int = 20,
+        offset: int = 0,
+        query: Optional[str] = None,
+        most_played: bool = False
+    ) -> List[Tuple]:
+        """
+        Column-only listing of completed generations for the list endpoints.
+        SELECTs just `fields` and returns plain row tuples in that order (no ORM
+        objects or identity map), paginated server-side with LIMIT/OFFSET.
+        `query` filters by full-text search; `most_played` orders by play count
+        instead of newest first.
+        """
+        table = MusicGeneration.__table__
+        criteria = [table.c.status == 'completed']
+        
+        if query:
+            criteria.append(table.c.prompt_tsv.op('@@')(func.websearch_to_tsquery('english', query)))
+        
+        if most_played:
+            criteria.append(table.c.play_count > 0)
+            order = desc(table.c.play_count)
+        else:
+            order = desc(table.c.created_at)
+        
+        try:
+            return session.execute(
+                select(*(table.c[name] for name in fields))
+                .where(*criteria)
+                .order_by(order)
+                .limit(limit)
+                .offset(offset)
+            ).all()
+            
+        except Exception as e:
+            logger.error(f"❌ Failed to list generations: {e}")
+            return []
+    
     @staticmethod
     def search_generations(
         session: Session, 
         query: str, 
         limit: int = 50
     ) -> List[Dict[str, Any]]:
-        """Search generations by prompt with full-text search"""
+        """Search generations by prompt with full-text search (GIN-indexed prompt_tsv)"""
         try:
-            # Use PostgreSQL full-text search if available
-            try:
-                generations = (
-                    session.query(MusicGeneration)
-                    .filter(and_(
-                        MusicGeneration.status == 'completed',
-                        func.to_tsvector('english', MusicGeneration.prompt)
-                        .match(func.plainto_tsquery('english', query))
-                    ))
-                    .order_by(desc(MusicGeneration.created_at))
-                    .limit(limit)
-                    .all()
-                )
-            except Exception:
-                # Fallback to simple ILIKE search
-                generations = (
-                    session.query(MusicGeneration)
-                    .filter(and_(
-                        MusicGeneration.status == 'completed',
-                        MusicGeneration.prompt.ilike(f'%{query}%')
-                    ))
-                    .order_by(desc(MusicGeneration.created_at))
-                    .limit(limit)
-                    .all()
-                )
+            rows = session.execute(_SEARCH_STMT, {'q': query, 'lim': limit}).mappings().all()
             
-            result = [gen.to_dict() for gen in generations]
+            result = [dict(row) for row in rows]
             logger.info(f"🔍 Search '{query}' returned {len(result)} results")
             return result
             
@@ -201,76 +504,99 @@ class DatabaseOperations:
         session: Session, 
         generation_id: str, 
         play_duration: Optional[float] = None
-    ) -> bool:
-        """Record a play event with proper validation"""
-        try:
-            generation = (
-                session.query(MusicGeneration)
-                .filter(MusicGeneration.generation_id == generation_id)
-                .first()
-            )
-            
-            if not generation:
-                logger.warning(f"⚠️ Generation not found for play tracking: {generation_id}")
-                return False
-            
-            generation.increment_play_count()
-            session.commit()
-            
-            logger.info(f"🎧 Play recorded: {generation_id} "
-                       f"(count: {generation.play_count}, "
-                       f"duration: {play_duration:.1f}s)" if play_duration else f"(count: {generation.play_count})")
-            
-            return True
-            
-        except Exception as e:
-            logger.error(f"❌ Failed to record play: {e}")
-            session.rollback()
-            return False
+    ) -> None:
+        """
+        Record a play event (fire-and-forget).
+        Plays are counted in memory and written in batches by the interaction
+        writer thread, so the caller never waits on a COMMIT. The id is not
+        looked up here; events for unknown generations match no row at flush time.
+        """
+        if not _buffer_interaction(_play_buffer, generation_id):
+            return
+        
+        if play_duration:
+            logger.info("🎧 Play recorded: %s (duration: %.1fs)", generation_id, play_duration)
+        else:
+            logger.info("🎧 Play recorded: %s", generation_id)
     
     @staticmethod
-    def record_download(session: Session, generation_id: str) -> bool:
-        """Record a download event"""
+    def record_download(session: Session, generation_id: str) -> None:
+        """Record a download event (fire-and-forget, like record_play)"""
+        if _buffer_interaction(_download_buffer, generation_id):
+            logger.info("💾 Download recorded: %s", generation_id)
+    
+    @staticmethod
+    def flush_interaction_counters(session: Session) -> int:
+        """
+        Write buffered play/download counts with one batched UPDATE each.
+        Returns the number of events flushed; on failure the counts are
+        put back so the next flush retries them, until
+        INTERACTION_MAX_FLUSH_FAILURES consecutive failures drop them.
+        """
+        global _pending_interactions, _dropped_interactions, _interaction_flush_failures
+        
+        with _interaction_lock:
+            plays = dict(_play_buffer)
+            downloads = dict(_download_buffer)
+            flushed = _pending_interactions
+            dropped = _dropped_interactions
+            _play_buffer.clear()
+            _download_buffer.clear()
+            _pending_interactions = 0
+            _dropped_interactions = 0
+        
+        if dropped:
+            logger.warning(f"⚠️ Dropped {dropped} play/download events (buffer limit {INTERACTION_BUFFER_LIMIT})")
+        if not flushed:
+            return 0
+        
         try:
-            generation = (
-                session.query(MusicGeneration)
-                .filter(MusicGeneration.generation_id == generation_id)
-                .first()
-            )
-            
-            if not generation:
-                logger.warning(f"⚠️ Generation not found for download tracking: {generation_id}")
-                return False
-            
-            generation.increment_download_count()
+            unmatched = 0
+            if plays:
+                result = session.execute(_FLUSH_PLAYS, {'gids': list(plays), 'deltas': list(plays.values())})
+                unmatched += len(plays) - result.rowcount
+            if downloads:
+                result = session.execute(_FLUSH_DOWNLOADS, {'gids': list(downloads), 'deltas': list(downloads.values())})
+                unmatched += len(downloads) - result.rowcount
             session.commit()
+            _interaction_flush_failures = 0
             
-            logger.info(f"💾 Download recorded: {generation_id} (count: {generation.download_count})")
-            return True
+            if unmatched:
+                logger.warning(f"⚠️ {unmatched} play/download counters referenced unknown generations")
+            logger.debug(f"💾 Flushed {flushed} play/download events")
+            return flushed
             
         except Exception as e:
-            logger.error(f"❌ Failed to record download: {e}")
             session.rollback()
-            return False
+            _interaction_flush_failures += 1
+            if _interaction_flush_failures >= INTERACTION_MAX_FLUSH_FAILURES:
+                logger.error(
+                    f"❌ Failed to flush play/download counters {_interaction_flush_failures} times, "
+                    f"dropping {flushed} events: {e}"
+                )
+                _interaction_flush_failures = 0
+                return 0
+            logger.error(f"❌ Failed to flush play/download counters: {e}")
+            with _interaction_lock:
+                _play_buffer.update(plays)
+                _download_buffer.update(downloads)
+                _pending_interactions += flushed
+            return 0
     
     @staticmethod
     def toggle_favorite(session: Session, generation_id: str) -> Optional[bool]:
-        """Toggle favorite status and return new status"""
+        """Toggle favorite status and return new status (single UPDATE ... RETURNING)"""
         try:
-            generation = (
-                session.query(MusicGeneration)
-                .filter(MusicGeneration.generation_id == generation_id)
-                .first()
-            )
+            new_status = MusicGeneration.toggle_favorite_sql(session, generation_id)
             
-            if not generation:
+            if new_status is None:
                 logger.warning(f"⚠️ Generation not found for favorite toggle: {generation_id}")
+                session.rollback()
                 return None
             
-            new_status = generation.toggle_favorite()
             session.commit()
             
-            logger.info(f"❤️ Favorite {'added' if new_status else 'removed'}: {generation_id}")
+            logger.info("❤️ Favorite %s: %s", "added" if new_status else "removed", generation_id)
             return new_status
             
         except Exception as e:
@@ -279,6 +605,7 @@ class DatabaseOperations:
             return None
     
     @staticmethod
+    @_ttl_cached
     def get_generation_stats(session: Session, days: int = 7) -> Dict[str, Any]:
         """Get comprehensive generation statistics"""
         try:
@@ -286,64 +613,58 @@ class DatabaseOperations:
             end_date = datetime.utcnow()
             start_date = end_date - timedelta(days=days)
             
-            # Base query for the time period
-            base_query = session.query(MusicGeneration).filter(
-                MusicGeneration.created_at >= start_date
-            )
+            recent_start = end_date - timedelta(hours=24)
+            
+            in_period = MusicGeneration.created_at >= start_date
+            completed_in_period = and_(MusicGeneration.status == 'completed', in_period)
+            
+            # Counts, performance and engagement metrics in one pass, using
+            # FILTER aggregates (metrics only for successful generations)
+            totals = session.execute(
+                select(
+                    func.count().filter(in_period).label('total'),
+                    func.count().filter(completed_in_period).label('ok'),
+                    func.count().filter(and_(MusicGeneration.status == 'failed', in_period)).label('bad'),
+                    func.count().filter(MusicGeneration.created_at >= recent_start).label('recent'),
+                    func.avg(MusicGeneration.generation_time).filter(completed_in_period).label('avg_time'),
+                    func.avg(MusicGeneration.realtime_factor).filter(completed_in_period).label('avg_rtf'),
+                    func.sum(MusicGeneration.file_size_mb).filter(completed_in_period).label('total_size'),
+                    func.avg(MusicGeneration.file_size_mb).filter(completed_in_period).label('avg_size'),
+                    func.sum(MusicGeneration.play_count).filter(completed_in_period).label('plays'),
+                    func.sum(MusicGeneration.download_count).filter(completed_in_period).label('downloads'),
+                    func.count().filter(and_(completed_in_period, MusicGeneration.is_favorited)).label('favorites')
+                ).where(MusicGeneration.created_at >= min(start_date, recent_start))
+            ).one()
             
-            # Basic counts
-            total_generations = base_query.count()
-            successful_generations = base_query.filter(
-                MusicGeneration.status == 'completed'
-            ).count()
-            failed_generations = base_query.filter(
-                MusicGeneration.status == 'failed'
-            ).count()
+            total_generations = totals.total
+            successful_generations = totals.ok
+            failed_generations = totals.bad
+            recent_generations = totals.recent
             
             # Success rate
             success_rate = (successful_generations / max(total_generations, 1)) * 100
             
-            # Performance metrics (only for successful generations)
-            successful_gens = base_query.filter(
-                MusicGeneration.status == 'completed'
+            avg_generation_time = float(totals.avg_time or 0.0)
+            avg_realtime_factor = float(totals.avg_rtf or 0.0)
+            total_file_size = float(totals.total_size or 0.0)
+            avg_file_size = float(totals.avg_size or 0.0)
+            total_plays = int(totals.plays or 0)
+            total_downloads = int(totals.downloads or 0)
+            total_favorites = totals.favorites
+            
+            # Device usage breakdown - one HashAggregate row per device
+            device_rows = session.execute(
+                select(
+                    MusicGeneration.device,
+                    func.count().label('count'),
+                    func.avg(MusicGeneration.generation_time).label('avg_time')
+                ).where(completed_in_period).group_by(MusicGeneration.device)
             ).all()
             
-            if successful_gens:
-                avg_generation_time = sum(g.generation_time for g in successful_gens) / len(successful_gens)
-                avg_realtime_factor = sum(g.realtime_factor for g in successful_gens) / len(successful_gens)
-                total_file_size = sum(g.file_size_mb for g in successful_gens)
-                avg_file_size = total_file_size / len(successful_gens)
-            else:
-                avg_generation_time = 0.0
-                avg_realtime_factor = 0.0
-                total_file_size = 0.0
-                avg_file_size = 0.0
-            
-            # User engagement metrics
-            total_plays = sum(g.play_count for g in successful_gens)
-            total_downloads = sum(g.download_count for g in successful_gens)
-            total_favorites = len([g for g in successful_gens if g.is_favorited])
-            
-            # Device usage breakdown
-            device_stats = {}
-            for gen in successful_gens:
-                device = gen.device
-                if device not in device_stats:
-                    device_stats[device] = {'count': 0, 'avg_time': 0, 'total_time': 0}
-                device_stats[device]['count'] += 1
-                device_stats[device]['total_time'] += gen.generation_time
-            
-            # Calculate averages for device stats
-            for device in device_stats:
-                stats = device_stats[device]
-                stats['avg_time'] = stats['total_time'] / stats['count']
-                del stats['total_time']  # Remove total_time from output
-            
-            # Recent activity (last 24 hours)
-            recent_start = end_date - timedelta(hours=24)
-            recent_generations = session.query(MusicGeneration).filter(
-                MusicGeneration.created_at >= recent_start
-            ).count()
+            device_stats = {
+                row.device: {'count': row.count, 'avg_time': float(row.avg_time or 0.0)}
+                for row in device_rows
+            }
             
             stats = {
                 "period_days": days,
@@ -357,6 +678,7 @@ class DatabaseOperations:
                 "avg_file_size_mb": round(avg_file_size, 2),
                 "total_plays": total_plays,
                 "total_downloads": total_downloads,
+                "avg_plays_per_generation": round(total_plays / max(successful_generations, 1), 2),
                 "total_favorites": total_favorites,
                 "device_breakdown": device_stats,
                 "recent_24h_generations": recent_generations,
@@ -380,22 +702,45 @@ class DatabaseOperations:
                 "success_rate": 0.0
             }
     
+    @staticmethod
+    def get_perf_stats_v2(session: Session, days: int = 7) -> PerfStats:
+        """Performance/engagement aggregates for the last `days` days in a single statement"""
+        try:
+            row = session.execute(
+                _PERF_STATS_STMT,
+                {"since": datetime.utcnow() - timedelta(days=days)}
+            ).one()
+            
+            return PerfStats(
+                avg_time=round(float(row.avg_time), 2),
+                total=row.total,
+                success_rate=round(row.ok / max(row.total, 1) * 100, 2),
+                avg_rtf=round(float(row.avg_rtf), 2),
+                plays=int(row.plays),
+                downloads=int(row.downloads),
+                avg_plays=round(int(row.plays) / max(row.ok, 1), 2)
+            )
+            
+        except Exception as e:
+            logger.error(f"❌ Failed to get performance stats: {e}")
+            session.rollback()
+            return PerfStats(0.0, 0, 0.0, 0.0, 0, 0, 0.0)
+    
     @staticmethod
     def get_favorites(session: Session, limit: int = 50) -> List[Dict[str, Any]]:
         """Get user's favorite generations"""
         try:
-            generations = (
-                session.query(MusicGeneration)
-                .filter(and_(
+            rows = session.execute(
+                select(*GENERATION_LIST_COLUMNS)
+                .where(and_(
                     MusicGeneration.status == 'completed',
-                    MusicGeneration.is_favorited == True
+                    MusicGeneration.is_favorited  # same predicate as idx_generations_favorites_created
                 ))
                 .order_by(desc(MusicGeneration.created_at))
                 .limit(limit)
-                .all()
-            )
+            ).mappings().all()
             
-            result = [gen.to_dict() for gen in generations]
+            result = [dict(row) for row in rows]
             logger.info(f"❤️ Retrieved {len(result)} favorite generations")
             return result
             
@@ -414,43 +759,37 @@ class DatabaseOperations:
         try:
             cutoff_date = datetime.utcnow() - timedelta(days=days_to_keep)
             
-            # Build deletion query
-            query = session.query(MusicGeneration).filter(
-                MusicGeneration.created_at < cutoff_date
-            )
+            # Build deletion criteria
+            criteria = [MusicGeneration.created_at < cutoff_date]
             
             if keep_favorites:
-                query = query.filter(MusicGeneration.is_favorited == False)
-            
-            generations_to_delete = query.all()
+                criteria.append(MusicGeneration.is_favorited.is_(False))
             
             if dry_run:
                 return {
                     "dry_run": True,
-                    "generations_to_delete": len(generations_to_delete),
+                    "generations_to_delete": session.execute(
+                        select(func.count()).select_from(MusicGeneration).where(*criteria)
+                    ).scalar_one(),
                     "cutoff_date": cutoff_date.isoformat(),
                     "keep_favorites": keep_favorites
                 }
             
-            # Actually delete records and files
-            deleted_files = 0
-            deleted_records = 0
-            
-            for gen in generations_to_delete:
-                # Delete physical file if it exists
-                if gen.file_path and os.path.exists(gen.file_path):
-                    try:
-                        os.remove(gen.file_path)
-                        deleted_files += 1
-                    except OSError as e:
-                        logger.warning(f"⚠️ Failed to delete file {gen.file_path}: {e}")
-                
-                # Delete database record
-                session.delete(gen)
-                deleted_records += 1
-            
+            # Delete records in one statement; RETURNING hands back the files to remove
+            file_paths = session.execute(
+                delete(MusicGeneration)
+                .where(*criteria)
+                .returning(MusicGeneration.file_path)
+                .execution_options(synchronize_session=False)
+            ).scalars().all()
             session.commit()
             
+            deleted_records = len(file_paths)
+            
+            # Delete physical files in parallel (unlinks are I/O-bound)
+            with ThreadPoolExecutor(max_workers=CLEANUP_FILE_WORKERS) as executor:
+                deleted_files = sum(executor.map(_remove_file, [path for path in file_paths if path]))
+            
             logger.info(f"🧹 Cleanup completed: {deleted_records} records, {deleted_files} files")
             
             return {
@@ -467,37 +806,93 @@ class DatabaseOperations:
             return {"error": str(e)}
     
     @staticmethod
-    def record_system_metrics(
+    def _system_metrics_row(metrics: Dict[str, Any]) -> Dict[str, Any]:
+        """Normalize a metrics dict to system_metrics columns (sample time kept)"""
+        return {
+            'timestamp': metrics.get('timestamp') or datetime.now(timezone.utc),
+            'cpu_usage': metrics.get('cpu_usage'),
+            'memory_usage': metrics.get('memory_usage'),
+            'gpu_usage': metrics.get('gpu_usage'),
+            'gpu_memory_usage': metrics.get('gpu_memory_usage'),
+            'disk_usage': metrics.get('disk_usage'),
+            'model_loaded': metrics.get('model_loaded', False),
+            'model_load_time': metrics.get('model_load_time'),
+            'active_generations': metrics.get('active_generations', 0),
+            'response_time_avg': metrics.get('response_time_avg'),
+            'error_rate': metrics.get('error_rate', 0.0),
+            'requests_per_minute': metrics.get('requests_per_minute', 0)
+        }
+    
+    @staticmethod
+    def record_system_metrics_batch(
         session: Session,
-        metrics: Dict[str, Any]
+        metrics_batch: List[Dict[str, Any]]
     ) -> bool:
-        """Record system performance metrics"""
+        """Record many metric samples with one executemany INSERT and one commit"""
+        if not metrics_batch:
+            return True
+        
         try:
-            system_metric = SystemMetrics(
-                cpu_usage=metrics.get('cpu_usage'),
-                memory_usage=metrics.get('memory_usage'),
-                gpu_usage=metrics.get('gpu_usage'),
-                gpu_memory_usage=metrics.get('gpu_memory_usage'),
-                disk_usage=metrics.get('disk_usage'),
-                model_loaded=metrics.get('model_loaded', False),
-                model_load_time=metrics.get('model_load_time'),
-                active_generations=metrics.get('active_generations', 0),
-                response_time_avg=metrics.get('response_time_avg'),
-                error_rate=metrics.get('error_rate', 0.0),
-                requests_per_minute=metrics.get('requests_per_minute', 0)
-            )
-            
-            session.add(system_metric)
+            rows = [DatabaseOperations._system_metrics_row(m) for m in metrics_batch]
+            if len(rows) >= METRICS_COPY_THRESHOLD:
+                DatabaseOperations._copy_system_metrics(session, rows)
+            else:
+                session.execute(SystemMetrics.__table__.insert(), rows)
             session.commit()
             
             return True
             
         except Exception as e:
-            logger.error(f"❌ Failed to record system metrics: {e}")
+            logger.error(f"❌ Failed to record {len(metrics_batch)} system metrics: {e}")
             session.rollback()
             return False
     
     @staticmethod
+    def _copy_system_metrics(session: Session, rows: List[Dict[str, Any]]) -> None:
+        """Stream metric rows through COPY ... FROM STDIN (CSV) on the session's connection"""
+        columns = list(rows[0])
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            # None -> empty unquoted field, which CSV COPY reads as NULL
+            writer.writerow(['' if row[column] is None else row[column] for column in columns])
+        buffer.seek(0)
+        
+        cursor = session.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY system_metrics ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
+        finally:
+            cursor.close()
+    
+    @staticmethod
+    def record_system_metrics(
+        session: Session,
+        metrics: Dict[str, Any]
+    ) -> bool:
+        """
+        Record system performance metrics.
+        Samples are buffered and written in batches (every
+        METRICS_FLUSH_SIZE samples or METRICS_FLUSH_INTERVAL seconds).
+        """
+        global _metrics_last_flush
+        
+        with _metrics_lock:
+            _metrics_buffer.append(DatabaseOperations._system_metrics_row(metrics))
+            now = time.monotonic()
+            if len(_metrics_buffer) < METRICS_FLUSH_SIZE and now - _metrics_last_flush < METRICS_FLUSH_INTERVAL:
+                return True
+            
+            batch = list(_metrics_buffer)
+            _metrics_buffer.clear()
+            _metrics_last_flush = now
+        
+        return DatabaseOperations.record_system_metrics_batch(session, batch)
+    
+    @staticmethod
+    @_ttl_cached
     def get_system_health(session: Session) -> Dict[str, Any]:
         """Get current system health status"""
         try:
@@ -511,7 +906,7 @@ class DatabaseOperations:
             # Get recent generation stats
             recent_gens = session.query(MusicGeneration).filter(
                 MusicGeneration.created_at >= datetime.utcnow() - timedelta(hours=1)
-            ).all()
+            ).options(load_only(MusicGeneration.status)).all()
             
             recent_success = len([g for g in recent_gens if g.status == 'completed'])
             recent_failed = len([g for g in recent_gens if g.status == 'failed'])
@@ -550,4 +945,101 @@ class DatabaseOperations:
                 "health_score": 0,
                 "status": "unknown",
                 "error": str(e)
-            }
\ No newline at end of file
+            }
+
+# =============================================================================
+# BACKGROUND FLUSHING OF INTERACTION COUNTERS
+# =============================================================================
+
+def _buffer_interaction(buffer: Counter, generation_id: str) -> bool:
+    """
+    Count one event and wake the writer early once a full batch is pending.
+    The writer is started on the first buffered event if the app didn't start
+    it, so counts are never left sitting in memory. Returns False (and drops
+    the event) once INTERACTION_BUFFER_LIMIT events are already pending.
+    """
+    global _pending_interactions, _dropped_interactions
+    
+    with _interaction_lock:
+        if _pending_interactions >= INTERACTION_BUFFER_LIMIT:
+            _dropped_interactions += 1
+            return False
+        buffer[generation_id] += 1
+        _pending_interactions += 1
+        pending = _pending_interactions
+    
+    if _interaction_writer is None or not _interaction_writer.is_alive():
+        start_interaction_writer()
+    if pending >= INTERACTION_FLUSH_SIZE:
+        _interaction_wakeup.set()
+    return True
+
+def flush_pending_interactions() -> int:
+    """Flush buffered play/download counts using a dedicated session"""
+    from .database import get_db_session
+    
+    with get_db_session() as session:
+        return DatabaseOperations.flush_interaction_counters(session)
+
+def _flush_interactions_at_exit():
+    """Final flush at interpreter exit, whether or not the writer thread ran"""
+    if not _pending_interactions:
+        return
+    try:
+        flush_pending_interactions()
+    except Exception as e:
+        logger.error(f"❌ Failed to flush play/download counters at exit: {e}")
+
+atexit.register(_flush_interactions_at_exit)
+
+def flush_pending_metrics() -> bool:
+    """Write any buffered system-metric samples using a dedicated session"""
+    global _metrics_last_flush
+    from .database import get_db_session
+    
+    with _metrics_lock:
+        batch = list(_metrics_buffer)
+        _metrics_buffer.clear()
+        _metrics_last_flush = time.monotonic()
+    
+    if not batch:
+        return True
+    with get_db_session() as session:
+        return DatabaseOperations.record_system_metrics_batch(session, batch)
+
+def _flush_metrics_at_exit():
+    """Final flush of buffered metric samples at interpreter exit"""
+    if not _metrics_buffer:
+        return
+    try:
+        flush_pending_metrics()
+    except Exception as e:
+        logger.error(f"❌ Failed to flush system metrics at exit: {e}")
+
+atexit.register(_flush_metrics_at_exit)
+
+def _interaction_writer_loop():
+    """Writer thread: flush every INTERACTION_FLUSH_INTERVAL seconds or when woken"""
+    while True:
+        _interaction_wakeup.wait(INTERACTION_FLUSH_INTERVAL)
+        _interaction_wakeup.clear()
+        try:
+            flush_pending_interactions()
+        except Exception as e:
+            logger.error(f"Interaction writer error: {e}")
+
+def start_interaction_writer() -> None:
+    """Start the background play/download writer (idempotent, thread-safe)"""
+    global _interaction_writer
+    
+    with _writer_start_lock:
+        if _interaction_writer is not None and _interaction_writer.is_alive():
+            return
+        
+        _interaction_writer = threading.Thread(
+            target=_interaction_writer_loop,
+            name="interaction-writer",
+            daemon=True
+        )
+        _interaction_writer.start()
+    logger.info("💾 Play/download writer thread started")
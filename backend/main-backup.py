@@ -1,32 +1,60 @@
 from fastapi import FastAPI, Depends, HTTPException
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 from fastapi.staticfiles import StaticFiles
 import time
 import os
+import re
+import json
+import hashlib
+import traceback
+import uuid
+
+# Let the CUDA caching allocator grow segments in place instead of fragmenting
+# on variable-length generations (must be set before CUDA is initialized)
+os.environ.setdefault("PYTORCH_CUDA_ALLOC_CONF", "expandable_segments:True,max_split_size_mb:128")
+
 import torch
 import torchaudio
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+import threading
+import asyncio
+import gc
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
 from datetime import datetime
 from pydantic import BaseModel
 from contextlib import asynccontextmanager
 from typing import Optional, Dict, Any
 
+# Optional: torchao weight-only INT8 quantization for the LM
+try:
+    from torchao.quantization import quantize_, int8_weight_only
+    TORCHAO_AVAILABLE = True
+except ImportError:
+    TORCHAO_AVAILABLE = False
+
 # Database imports
-from database import get_db, test_connection_and_setup, create_tables
+from database import get_db, test_connection_and_setup, create_tables, SessionLocal
 from database.operations import DatabaseOperations
 from database.models import MusicGeneration
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('music_generation.log', encoding='utf-8'),
-        logging.StreamHandler()  # Also log to console
-    ]
+# Configure logging: request threads only enqueue records; a QueueListener
+# thread does the formatting and file/console I/O
+_log_handlers = (
+    logging.FileHandler('music_generation.log', encoding='utf-8'),
+    logging.StreamHandler()  # Also log to console
 )
+for _handler in _log_handlers:
+    _handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+_log_queue = queue.Queue(-1)
+_log_listener = QueueListener(_log_queue, *_log_handlers)
+_log_listener.start()
+logging.basicConfig(level=logging.INFO, handlers=[QueueHandler(_log_queue)], force=True)
 logger = logging.getLogger(__name__)
 
 # Fix Windows console encoding for emojis
@@ -35,11 +63,27 @@ if sys.platform == "win32":
     import os
     os.environ["PYTHONIOENCODING"] = "utf-8"
 
+# Device capabilities never change after startup: query the driver once
+CUDA_AVAILABLE = torch.cuda.is_available()
+CUDA_VERSION = torch.version.cuda
+DEVICE_NAME = torch.cuda.get_device_name(0) if CUDA_AVAILABLE else "CPU"
+PRECISION = "FP16" if CUDA_AVAILABLE else "FP32"
+
+def configure_torch_backends():
+    """Process-wide GPU performance flags - set once, before the model is loaded"""
+    if CUDA_AVAILABLE:
+        torch.backends.cudnn.benchmark = True
+        torch.backends.cuda.matmul.allow_tf32 = True
+        torch.backends.cudnn.allow_tf32 = True
+        torch.set_float32_matmul_precision('high')  # TF32 matmuls on Ampere+
+        logger.info("🔧 Enabled performance optimizations")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    configure_torch_backends()
     logger.info("🎵 Music Genie API starting up...")
-    logger.info(f"📁 Audio directory: {AUDIO_DIR}")
+    logger.info("📁 Audio directory: %s", AUDIO_DIR)
     
     # Test database connection
     logger.info("🔍 Testing database connection...")
@@ -50,40 +94,112 @@ async def lifespan(app: FastAPI):
             create_tables()
             logger.info("📊 Database tables verified/created")
         except Exception as e:
-            logger.error(f"❌ Database table creation failed: {e}")
+            logger.error("❌ Database table creation failed: %s", e)
     else:
         logger.warning("⚠️ Database connection failed - continuing without database")
     
     # GPU diagnostics
     logger.info("🖥️ GPU Diagnostics:")
-    logger.info(f"   - PyTorch version: {torch.__version__}")
-    logger.info(f"   - CUDA available: {torch.cuda.is_available()}")
-    if torch.cuda.is_available():
-        logger.info(f"   - CUDA version: {torch.version.cuda}")
-        logger.info(f"   - GPU count: {torch.cuda.device_count()}")
+    logger.info("   - PyTorch version: %s", torch.__version__)
+    logger.info("   - CUDA available: %s", CUDA_AVAILABLE)
+    if CUDA_AVAILABLE:
+        logger.info("   - CUDA version: %s", CUDA_VERSION)
+        logger.info("   - GPU count: %s", torch.cuda.device_count())
         for i in range(torch.cuda.device_count()):
-            logger.info(f"   - GPU {i}: {torch.cuda.get_device_name(i)}")
-            logger.info(f"   - GPU {i} memory: {torch.cuda.get_device_properties(i).total_memory / 1024**3:.1f} GB")
+            logger.info("   - GPU %s: %s", i, torch.cuda.get_device_name(i))
+            logger.info("   - GPU %s memory: %.1f GB", i, torch.cuda.get_device_properties(i).total_memory / 1024**3)
     else:
         logger.warning("   - No CUDA GPUs detected")
     
+    # Device name/count/total memory are fixed for the CUDA context: read them once
+    app.state.gpu_static = None
+    if CUDA_AVAILABLE:
+        total_mem_gb = torch.cuda.get_device_properties(0).total_memory / 1024**3
+        app.state.gpu_static = {
+            "name": DEVICE_NAME,
+            "count": torch.cuda.device_count(),
+            "total_mem_gb": total_mem_gb,
+            "total_mem": f"{total_mem_gb:.1f} GB"
+        }
+    
     # Pre-load model to check GPU usage
     try:
         model = get_model()
+        warmup_model(model)
         logger.info("🎼 Model pre-loaded successfully on startup")
     except Exception as e:
-        logger.error(f"❌ Failed to pre-load model: {e}")
+        logger.error("❌ Failed to pre-load model: %s", e)
+    
+    # Constant responses are serialized once and served as raw bytes
+    app.state.audio_formats_json = _dumps(_audio_formats())
+    app.state.presets_json = _dumps({
+        "success": True,
+        "presets": _PRESETS,
+        "count": len(_PRESETS),
+        "parameter_ranges": _PARAM_RANGES
+    })
+    app.state.model_info_static = None  # filled on first /debug/model-info
+    
+    global _generation_queue, _db_write_queue
+    _generation_queue = asyncio.Queue()
+    batcher_task = asyncio.create_task(generation_batcher())
+    _db_write_queue = asyncio.Queue()
+    db_writer_task = asyncio.create_task(db_writer())
+    app.state.sys_snapshot = _system_info()
+    sys_sampler_task = asyncio.create_task(_sys_sampler())
     
     yield
     
     # Shutdown
     logger.info("🎵 Music Genie API shutting down...")
+    batcher_task.cancel()
+    sys_sampler_task.cancel()
+    _generation_queue = None
+    # Cancelling the writer flushes whatever is still queued
+    db_writer_task.cancel()
+    try:
+        await db_writer_task
+    except asyncio.CancelledError:
+        pass
+    _db_write_queue = None
+    GENERATE_EXEC.shutdown(wait=True)
+    SAVE_EXEC.shutdown(wait=True)
     # Clean up GPU memory on shutdown
-    if torch.cuda.is_available():
+    if CUDA_AVAILABLE:
         torch.cuda.empty_cache()
         logger.info("🧹 GPU memory cleared")
+    # Drain queued log records and stop the listener thread
+    _log_listener.stop()
+
+# Serialize responses with orjson when available (C encoder, native datetimes)
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse
+    DefaultResponse = ORJSONResponse
+    _dumps = orjson.dumps
+except ImportError:
+    logger.info("ℹ️ orjson not installed - using standard JSONResponse")
+    DefaultResponse = JSONResponse
+    
+    def _dumps(content) -> bytes:
+        return json.dumps(content).encode()
+
+# Unexpected failures answer 500 with a body serialized once at import;
+# DEBUG=1 appends the tail of the traceback
+DEBUG = os.getenv("DEBUG", "0") == "1"
+_GENERIC_ERR = _dumps({"success": False, "error": "internal error"})
 
-app = FastAPI(title="Music Genie API", lifespan=lifespan)
+def _error_response(status_code: int = 500, **extra) -> Response:
+    """Error response for the exception being handled (call from an except block)"""
+    if DEBUG:
+        extra["traceback"] = traceback.format_exc()[-512:]
+    if extra:
+        body = _dumps({"success": False, "error": "internal error", **extra})
+    else:
+        body = _GENERIC_ERR
+    return Response(body, status_code=status_code, media_type="application/json")
+
+app = FastAPI(title="Music Genie API", lifespan=lifespan, default_response_class=DefaultResponse)
 
 # Create audio directory if it doesn't exist
 AUDIO_DIR = r"C:\Users\derek\CascadeProjects\music-genie\backend\audio"
@@ -129,82 +245,447 @@ class MixerSettingsRequest(BaseModel):
     generation_id: str
     settings: Dict[str, Any]
 
+# Characters allowed in filenames derived from prompts
+_SAFE_RE = re.compile(r'[^A-Za-z0-9 _-]+')
+
+def _gpu_mem_gb() -> float:
+    """Currently allocated GPU memory in GB (0.0 without CUDA)"""
+    return torch.cuda.memory_allocated() / 1024**3 if CUDA_AVAILABLE else 0.0
+
 # Cache model to avoid reloading (significant performance improvement)
 _cached_model = None
+_cached_model_is_half = False  # set by get_model: the LM's weights are FP16
+
+_LM_ATTRS = ('lm', 'model', 'generation_model', 'decoder')
+
+def _get_lm(model):
+    """Return MusicGen's autoregressive transformer (audiocraft keeps it at .lm)"""
+    for attr in _LM_ATTRS:
+        if hasattr(model, attr):
+            return getattr(model, attr)
+    return None
+
+def _set_lm(model, lm):
+    """Replace the transformer found by _get_lm"""
+    for attr in _LM_ATTRS:
+        if hasattr(model, attr):
+            setattr(model, attr, lm)
+            return
+
+def _lm_is_half(model):
+    """True if the transformer's weights are FP16 (then autocast is unnecessary)"""
+    lm = _get_lm(model)
+    if lm is None:
+        return False
+    try:
+        return next(lm.parameters()).dtype == torch.float16
+    except (AttributeError, StopIteration):
+        return False
+
+# Last params passed to set_generation_params: (duration, top_k, top_p, temperature, cfg_coef)
+_cached_gen_params = None
+
+def apply_generation_params(model, duration=10, top_k=250, top_p=0.0, temperature=1.0, cfg_coef=3.0):
+    """Call model.set_generation_params only when the params differ from the last call"""
+    global _cached_gen_params
+    params = (duration, top_k, top_p, temperature, cfg_coef)
+    if params == _cached_gen_params:
+        return
+    model.set_generation_params(
+        duration=duration,
+        use_sampling=True,
+        top_k=top_k,
+        top_p=top_p,
+        temperature=temperature,
+        cfg_coef=cfg_coef
+    )
+    _cached_gen_params = params
+
+# Generation always runs at the exact requested duration: padding it up to a
+# bucket would cost extra autoregressive steps per request. Only host-side
+# staging buffers are sized to these buckets, so they stay reusable across
+# nearby durations (and the traced codec covers these exact lengths)
+DURATION_BUCKETS = (5.0, 10.0, 15.0, 20.0, 30.0)
+
+def _duration_bucket(duration: float) -> float:
+    """Smallest bucket that fits the duration (longer durations are returned as-is)"""
+    for bucket in DURATION_BUCKETS:
+        if duration <= bucket:
+            return bucket
+    return duration
+
+# Reusable pinned CPU staging buffers for GPU -> CPU audio copies. Pinned
+# memory lets the copy run as an async DMA instead of a pageable memcpy.
+# At most PINNED_BUFFER_LIMIT are ever allocated; beyond that (or when none
+# fits) the copy falls back to pageable memory instead of growing the pool.
+PINNED_BUFFER_LIMIT = int(os.getenv("PINNED_BUFFER_LIMIT", "4"))
+_pinned_buffers = []
+_pinned_allocated = 0
+_pinned_lock = threading.Lock()
+
+def _acquire_pinned(numel: int, dtype: torch.dtype) -> Optional[torch.Tensor]:
+    """Take a free pinned buffer of dtype with at least numel elements, or None if the pool is exhausted"""
+    global _pinned_allocated
+    with _pinned_lock:
+        for i, buf in enumerate(_pinned_buffers):
+            if buf.dtype == dtype and buf.numel() >= numel:
+                return _pinned_buffers.pop(i)
+        if _pinned_allocated >= PINNED_BUFFER_LIMIT:
+            return None
+        _pinned_allocated += 1
+    try:
+        return torch.empty(numel, dtype=dtype, pin_memory=True)
+    except Exception:
+        with _pinned_lock:
+            _pinned_allocated -= 1
+        raise
+
+def _release_pinned(buf: torch.Tensor) -> None:
+    """Return a staging buffer to the pool"""
+    with _pinned_lock:
+        _pinned_buffers.append(buf)
+
+def _audio_to_cpu(audio: torch.Tensor, sample_rate: int):
+    """
+    Start copying generated audio to CPU in its own dtype (FP16 stays FP16,
+    so half the bytes cross the bus). On CUDA the copy goes through a pinned
+    staging buffer sized to the duration bucket and is not waited on here.
+    Returns (tensor, CUDA event marking copy completion or None, pinned buffer
+    or None); _save_audio waits on the event and releases the buffer.
+    """
+    if not audio.is_cuda:
+        return audio.detach(), None, None
+    channels, samples = audio.shape[0], audio.shape[-1]
+    bucket_numel = channels * int(_duration_bucket(samples / sample_rate) * sample_rate)
+    staging = _acquire_pinned(max(bucket_numel, audio.numel()), audio.dtype)
+    if staging is None:
+        return audio.detach().cpu(), None, None
+    audio_tensor = staging[:audio.numel()].view(audio.shape)
+    audio_tensor.copy_(audio.detach(), non_blocking=True)
+    copied = torch.cuda.Event()
+    copied.record()
+    return audio_tensor, copied, staging
+
+# Recent successful /generate responses keyed by a hash of the request
+RESULT_CACHE_SIZE = 256
+_result_cache = OrderedDict()
+_result_cache_lock = threading.Lock()
+
+def _result_cache_key(request) -> str:
+    """Stable hash of the prompt and every generation parameter"""
+    payload = json.dumps(request.model_dump(), sort_keys=True).encode()
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+def _cached_result(key: str) -> Optional[Dict[str, Any]]:
+    """Copy of a cached response (marked cache_hit), or None if absent or the file is gone"""
+    with _result_cache_lock:
+        response = _result_cache.get(key)
+        if response is None:
+            return None
+        if not os.path.exists(response["filepath"]):
+            del _result_cache[key]
+            return None
+        _result_cache.move_to_end(key)
+    return {**response, "cache_hit": True}
+
+def _cache_result(key: str, response: Dict[str, Any]) -> None:
+    """Remember a response, evicting the least recently used beyond RESULT_CACHE_SIZE"""
+    with _result_cache_lock:
+        _result_cache[key] = dict(response)
+        _result_cache.move_to_end(key)
+        while len(_result_cache) > RESULT_CACHE_SIZE:
+            _result_cache.popitem(last=False)
+
+# WAV encoding/writing runs here so it doesn't block the event loop
+SAVE_EXEC = ThreadPoolExecutor(max_workers=2, thread_name_prefix="audio-save")
+
+def _save_audio(filepath: str, audio_tensor: torch.Tensor, sample_rate: int, copied=None, staging=None) -> None:
+    """Write 16-bit PCM WAV, then hand the pinned staging buffer back to the pool"""
+    try:
+        if copied is not None:
+            copied.synchronize()  # wait for the async device->host copy, on this thread
+        # The WAV encoders take float32; upcast here, on the save thread
+        if audio_tensor.dtype != torch.float32:
+            audio_tensor = audio_tensor.float()
+        # Write beside the final path and rename, so /audio never serves a partial file
+        tmp_path = f"{filepath}.tmp"
+        torchaudio.save(
+            tmp_path,
+            audio_tensor,
+            sample_rate=sample_rate,
+            format="wav",
+            bits_per_sample=16,
+            encoding='PCM_S'  # Explicit encoding for better compatibility
+        )
+        os.replace(tmp_path, filepath)
+    finally:
+        if staging is not None:
+            _release_pinned(staging)
+
+# =============================================================================
+# MICRO-BATCHED GENERATION
+# =============================================================================
+
+# Concurrent requests with the same sampler params are generated in one
+# model.generate() call; the batcher waits up to MAX_BATCH_LATENCY_MS to fill a batch
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "4"))
+MAX_BATCH_LATENCY_MS = int(os.getenv("MAX_BATCH_LATENCY_MS", "50"))
+
+# One worker: the model is shared, and generation also moves off the event loop
+GENERATE_EXEC = ThreadPoolExecutor(max_workers=1, thread_name_prefix="generate")
+_generation_queue = None
+
+def _generate_batch(params, prompts):
+    """Run one model.generate() for prompts sharing (duration, top_k, top_p, temperature, cfg_coef)"""
+    model = get_model()
+    duration, top_k, top_p, temperature, cfg_coef = params
+    apply_generation_params(
+        model,
+        duration=duration,
+        top_k=top_k,
+        top_p=top_p,
+        temperature=temperature,
+        cfg_coef=cfg_coef
+    )
+    with torch.inference_mode():  # More efficient than torch.no_grad()
+        # Weights already converted with .half() run as-is; autocast only for FP32 weights
+        if CUDA_AVAILABLE and not _cached_model_is_half:
+            with torch.cuda.amp.autocast():  # Automatic mixed precision
+                return model.generate(prompts)
+        return model.generate(prompts)
+
+async def generation_batcher():
+    """Background task: drain the generation queue in micro-batches"""
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await _generation_queue.get()]
+        deadline = loop.time() + MAX_BATCH_LATENCY_MS / 1000
+        while len(batch) < MAX_BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(_generation_queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        
+        groups = {}
+        for prompt, params, future in batch:
+            groups.setdefault(params, []).append((prompt, future))
+        
+        for params, items in groups.items():
+            try:
+                wav = await loop.run_in_executor(
+                    GENERATE_EXEC, _generate_batch, params, [prompt for prompt, _ in items]
+                )
+                if len(items) > 1:
+                    logger.info("📦 Generated batch of %d prompts", len(items))
+                for i, (_, future) in enumerate(items):
+                    if not future.done():
+                        future.set_result(wav[i:i + 1])
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+
+async def generate_audio(prompt: str, params):
+    """Queue a prompt for the batcher and wait for its audio ([1, channels, samples])"""
+    if _generation_queue is None:
+        # Batcher not running (e.g. startup failed) - generate directly
+        return await asyncio.get_running_loop().run_in_executor(GENERATE_EXEC, _generate_batch, params, [prompt])
+    future = asyncio.get_running_loop().create_future()
+    await _generation_queue.put((prompt, params, future))
+    return await future
+
+# =============================================================================
+# BACKGROUND DATABASE WRITES
+# =============================================================================
+
+# Generation records are queued by /generate and written in batches by
+# db_writer() with its own session, so responses never wait on the database
+DB_WRITE_BATCH_SIZE = int(os.getenv("DB_WRITE_BATCH_SIZE", "50"))
+DB_WRITE_INTERVAL_MS = int(os.getenv("DB_WRITE_INTERVAL_MS", "250"))
+_db_write_queue = None
+
+def _write_generation_records(rows):
+    """Insert a batch of generation rows with one multi-row INSERT + commit"""
+    session = SessionLocal()
+    try:
+        # Invalid rows are skipped and duplicate generation_ids ignored, so one
+        # bad record can't roll back the rest of the batch
+        DatabaseOperations.bulk_insert_generations(session, rows)
+    finally:
+        session.close()
+
+async def db_writer():
+    """Background task: drain the record queue every DB_WRITE_INTERVAL_MS or DB_WRITE_BATCH_SIZE rows"""
+    loop = asyncio.get_running_loop()
+    while True:
+        rows = [await _db_write_queue.get()]
+        deadline = loop.time() + DB_WRITE_INTERVAL_MS / 1000
+        try:
+            while len(rows) < DB_WRITE_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    rows.append(await asyncio.wait_for(_db_write_queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+        finally:
+            # Runs on cancellation too, so queued records are written at shutdown
+            while not _db_write_queue.empty():
+                rows.append(_db_write_queue.get_nowait())
+            await asyncio.to_thread(_write_generation_records, rows)
+
+def queue_generation_record(**row):
+    """Hand a generation record to the background writer (writes inline if it isn't running)"""
+    if _db_write_queue is None:
+        _write_generation_records([row])
+    else:
+        _db_write_queue.put_nowait(row)
+
+# torch.compile (CUDA graphs) for the LM decode loop - set COMPILE_MODEL=0 to disable
+COMPILE_MODEL = os.getenv("COMPILE_MODEL", "1") == "1"
+_eager_lm_forward = None  # kept so a failed warmup can fall back
+
+# TorchScript-traced EnCodec decode per duration bucket - set TRACE_CODEC=0 to disable
+TRACE_CODEC = os.getenv("TRACE_CODEC", "1") == "1"
+
+def _compile_model(model):
+    """Compile the LM forward with torch.compile(mode="reduce-overhead")"""
+    global _eager_lm_forward
+    lm = _get_lm(model)
+    if lm is None:
+        return
+    # lm.generate() calls self(...) per step; compiling the module wrapper
+    # would leave generate() on the eager module, so swap the forward itself
+    _eager_lm_forward = lm.forward
+    lm.forward = torch.compile(lm.forward, mode="reduce-overhead", dynamic=False)
+    logger.info("⚡ Compiled LM forward with torch.compile (reduce-overhead)")
+
+def _trace_codec(model):
+    """
+    Replace compression_model.decode with torch.jit traces, one per duration
+    bucket (the traced conv padding is shape-specialized). Codes of any other
+    shape, or an explicit scale, go through the eager decode.
+    """
+    codec = model.compression_model
+    eager_decode = codec.decode
+    device = next(codec.parameters()).device
+    traced = {}
+    with torch.no_grad():
+        for bucket in DURATION_BUCKETS:
+            codes = torch.zeros(
+                (1, codec.num_codebooks, int(bucket * codec.frame_rate)), dtype=torch.long, device=device
+            )
+            traced[tuple(codes.shape)] = torch.jit.trace_module(codec, {"decode": (codes,)})
+    
+    def decode(codes, scale=None):
+        module = traced.get(tuple(codes.shape)) if scale is None else None
+        if module is None:
+            return eager_decode(codes, scale)
+        return module.decode(codes)
+    
+    codec.decode = decode
+    logger.info(f"⚡ Traced EnCodec decode for {len(traced)} duration buckets (TorchScript)")
+
+def warmup_model(model):
+    """Run one short generation so compilation happens at startup, not on the first request"""
+    global _eager_lm_forward
+    if _eager_lm_forward is None:
+        return
+    warmup_start = time.perf_counter()
+    try:
+        apply_generation_params(model, duration=1)
+        with torch.inference_mode():
+            model.generate(["warmup"])
+        logger.info(f"🔥 Model warmed up in {time.perf_counter() - warmup_start:.1f}s")
+    except Exception as e:
+        logger.warning(f"⚠️ Compiled warmup failed, falling back to eager model: {e}")
+        _get_lm(model).forward = _eager_lm_forward
+        _eager_lm_forward = None
+    finally:
+        apply_generation_params(model)
 
 def get_model():
-    global _cached_model
+    global _cached_model, _cached_model_is_half
     if _cached_model is None:
         logger.info("🔄 Loading MusicGen model...")
-        model_load_start = time.time()
+        model_load_start = time.perf_counter()
         
         from audiocraft.models import MusicGen
         
         # Check device before loading
-        device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        logger.info(f"🎯 Target device: {device}")
+        device = torch.device('cuda' if CUDA_AVAILABLE else 'cpu')
+        logger.info("🎯 Target device: %s", device)
         
         # Load model with device specified
-        if torch.cuda.is_available():
+        if CUDA_AVAILABLE:
             logger.info("🚀 Loading model directly to GPU...")
             
-            # Performance optimizations for GPU
-            torch.backends.cudnn.benchmark = True
-            torch.backends.cuda.matmul.allow_tf32 = True
-            torch.backends.cudnn.allow_tf32 = True
-            
             # Load model
             _cached_model = MusicGen.get_pretrained('facebook/musicgen-small')
-            _cached_model.set_generation_params(
-                duration=10,
-                use_sampling=True,
-                top_k=250,
-                top_p=0.0,
-                temperature=1.0,
-                cfg_coef=3.0
-            )
+            apply_generation_params(_cached_model)
             
             # Move the underlying models to GPU (correct approach for MusicGen)
             logger.info("📤 Moving model components to GPU...")
             _cached_model.compression_model = _cached_model.compression_model.to(device)
             
-            # For MusicGen, the main model is accessible through different attributes
-            if hasattr(_cached_model, 'model'):
-                _cached_model.model = _cached_model.model.to(device)
-            elif hasattr(_cached_model, 'generation_model'):
-                _cached_model.generation_model = _cached_model.generation_model.to(device)
-            elif hasattr(_cached_model, 'decoder'):
-                _cached_model.decoder = _cached_model.decoder.to(device)
+            # audiocraft keeps the transformer at .lm (see _LM_ATTRS)
+            lm = _get_lm(_cached_model)
+            if lm is not None:
+                _set_lm(_cached_model, lm.to(device))
             
             # Enable half precision for faster inference (if supported)
             try:
                 _cached_model.compression_model = _cached_model.compression_model.half()
                 
                 # Apply half precision to the generation model
-                if hasattr(_cached_model, 'model'):
-                    _cached_model.model = _cached_model.model.half()
-                elif hasattr(_cached_model, 'generation_model'):
-                    _cached_model.generation_model = _cached_model.generation_model.half()
-                elif hasattr(_cached_model, 'decoder'):
-                    _cached_model.decoder = _cached_model.decoder.half()
-                    
-                logger.info("⚡ Enabled half precision (FP16) for faster inference")
+                lm = _get_lm(_cached_model)
+                if lm is not None:
+                    _set_lm(_cached_model, lm.half())
+                    logger.info("⚡ Enabled half precision (FP16) for faster inference")
             except Exception as e:
-                logger.warning(f"⚠️ Half precision not supported, using FP32: {e}")
+                logger.warning("⚠️ Half precision not supported, using FP32: %s", e)
             
-            # Verify model is on GPU
-            logger.info(f"📍 Model moved to: {device}")
-            logger.info(f"🎮 GPU name: {torch.cuda.get_device_name()}")
-            logger.info(f"💾 GPU memory after model load: {torch.cuda.memory_allocated() / 1024**3:.2f} GB")
+            # INT8 weight-only quantization of the LM (decode is bandwidth-bound
+            # at batch 1); EnCodec is small and stays in FP16
+            if TORCHAO_AVAILABLE:
+                try:
+                    lm = _get_lm(_cached_model)
+                    if lm is not None:
+                        quantize_(lm, int8_weight_only())
+                        logger.info("⚡ Quantized LM weights to INT8 (torchao)")
+                except Exception as e:
+                    logger.warning("⚠️ INT8 quantization failed, keeping FP16 weights: %s", e)
+            
+            # Autocast is skipped only when the LM really runs in FP16
+            _cached_model_is_half = _lm_is_half(_cached_model)
+            
+            if TRACE_CODEC:
+                try:
+                    _trace_codec(_cached_model)
+                except Exception as e:
+                    logger.warning("⚠️ EnCodec trace failed, decoding eagerly: %s", e)
+            
+            if COMPILE_MODEL:
+                try:
+                    _compile_model(_cached_model)
+                except Exception as e:
+                    logger.warning("⚠️ torch.compile unavailable, running eager: %s", e)
             
-            logger.info("🔧 Enabled performance optimizations")
+            # Verify model is on GPU
+            logger.info("📍 Model moved to: %s", device)
+            logger.info("🎮 GPU name: %s", DEVICE_NAME)
+            logger.info("💾 GPU memory after model load: %.2f GB", torch.cuda.memory_allocated() / 1024**3)
         else:
             logger.warning("⚠️ CUDA not available, using CPU (will be much slower)")
             _cached_model = MusicGen.get_pretrained('facebook/musicgen-small')
-            _cached_model.set_generation_params(duration=10)
+            apply_generation_params(_cached_model)
         
-        model_load_time = time.time() - model_load_start
-        logger.info(f"✅ Model loaded in {model_load_time:.2f} seconds")
+        model_load_time = time.perf_counter() - model_load_start
+        logger.info("✅ Model loaded in %.2f seconds", model_load_time)
     
     return _cached_model
 
@@ -227,154 +708,135 @@ async def root():
 async def health():
     return {
         "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
-        "gpu_available": torch.cuda.is_available(),
-        "gpu_memory": f"{torch.cuda.memory_allocated() / 1024**3:.2f} GB" if torch.cuda.is_available() else "N/A"
+        "timestamp": datetime.now(),
+        "gpu_available": CUDA_AVAILABLE,
+        "gpu_memory": f"{torch.cuda.memory_allocated() / 1024**3:.2f} GB" if CUDA_AVAILABLE else "N/A"
     }
 
 @app.post("/generate")
-async def generate_music(request: MusicRequest, db: Session = Depends(get_db)):
-    generation_id = f"gen_{int(time.time())}"
-    start_time = time.time()
+async def generate_music(request: MusicRequest):
+    # Unique even for same-second requests (generation_id is a UNIQUE column)
+    generation_id = f"gen_{int(time.time())}_{uuid.uuid4().hex[:8]}"
+    start_time = time.perf_counter()
+    
+    logger.info("🎼 [%s] Starting music generation (%ss): '%s'", generation_id, request.duration, request.prompt)
     
-    logger.info(f"🎼 [{generation_id}] Starting music generation")
-    logger.info(f"📝 [{generation_id}] Prompt: '{request.prompt}'")
-    logger.info(f"⏱️ [{generation_id}] Duration: {request.duration}s")
+    # Identical (prompt, params) requests reuse the audio that is already on disk
+    cache_key = _result_cache_key(request)
+    cached = _cached_result(cache_key)
+    if cached is not None:
+        logger.info("♻️ [%s] Cache hit - returning %s", generation_id, cached['generation_id'])
+        return cached
     
     try:
         # Load/get cached model
-        model_start = time.time()
+        model_start = time.perf_counter()
         model = get_model()
-        model_time = time.time() - model_start
-        
-        # Update model parameters based on request
-        model.set_generation_params(
-            duration=request.duration,
-            use_sampling=True,
-            top_k=request.top_k,
-            top_p=request.top_p,
-            temperature=request.temperature,
-            cfg_coef=request.cfg_coef
+        model_time = time.perf_counter() - model_start
+        
+        # Sampler params for this request (applied by the batcher, skipped when unchanged)
+        generation_params = (
+            request.duration,
+            request.top_k,
+            request.top_p,
+            request.temperature,
+            request.cfg_coef
         )
         
         if model_time > 0.1:  # Only log if model loading took significant time
-            logger.info(f"🔄 [{generation_id}] Model ready in {model_time:.2f}s")
+            logger.info("🔄 [%s] Model ready in %.2fs", generation_id, model_time)
         
         # Generate music with optimizations
-        logger.info(f"🎵 [{generation_id}] Generating audio...")
-        gen_start = time.time()
+        logger.info("🎵 [%s] Generating audio...", generation_id)
+        gen_start = time.perf_counter()
         
-        # Log GPU memory before generation
-        if torch.cuda.is_available():
-            logger.info(f"💾 [{generation_id}] GPU memory before generation: {torch.cuda.memory_allocated() / 1024**3:.2f} GB")
-            
-            # Clear GPU cache before generation for optimal memory usage
-            torch.cuda.empty_cache()
+        # GPU memory before generation
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("💾 [%s] GPU memory before generation: %.2f GB", generation_id, _gpu_mem_gb())
         
-        # Generate with optimized settings
-        with torch.inference_mode():  # More efficient than torch.no_grad()
-            if torch.cuda.is_available():
-                with torch.cuda.amp.autocast():  # Automatic mixed precision
-                    wav = model.generate([request.prompt])
-            else:
-                wav = model.generate([request.prompt])
+        # Generate with optimized settings (micro-batched with concurrent requests)
+        wav = await generate_audio(request.prompt, generation_params)
         
-        gen_time = time.time() - gen_start
+        gen_time = time.perf_counter() - gen_start
         
         # Log GPU memory after generation
-        if torch.cuda.is_available():
-            logger.info(f"💾 [{generation_id}] GPU memory after generation: {torch.cuda.memory_allocated() / 1024**3:.2f} GB")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("💾 [%s] GPU memory after generation: %.2f GB", generation_id, _gpu_mem_gb())
         
-        logger.info(f"✅ [{generation_id}] Audio generated in {gen_time:.2f}s")
+        logger.info("✅ [%s] Audio generated in %.2fs", generation_id, gen_time)
         
-        # Create filename with timestamp and sanitized prompt
-        safe_prompt = "".join(c for c in request.prompt if c.isalnum() or c in (' ', '-', '_')).strip()[:30]
-        filename = f"generated_{int(time.time())}_{safe_prompt.replace(' ', '_')}.wav"
+        # Filename from the unique generation_id plus the sanitized prompt, so
+        # concurrent requests never share a file (or its .tmp)
+        safe_prompt = _SAFE_RE.sub('', request.prompt).strip()[:30]
+        filename = f"generated_{generation_id}_{safe_prompt.replace(' ', '_')}.wav"
         filepath = os.path.join(AUDIO_DIR, filename)
         
         # Save the audio file with optimizations
-        logger.info(f"💾 [{generation_id}] Saving audio to {filename}")
-        save_start = time.time()
+        logger.info("💾 [%s] Saving audio to %s", generation_id, filename)
+        save_start = time.perf_counter()
         
-        # Move to CPU efficiently and save
-        audio_tensor = wav[0].detach().cpu().float()  # Ensure float32 for saving
+        # Start the copy to CPU via a pinned staging buffer; the save thread
+        # waits for it and upcasts to float32
+        audio_tensor, copied, staging = _audio_to_cpu(wav[0], model.sample_rate)
         
         # Calculate audio duration
         audio_duration = audio_tensor.shape[-1] / model.sample_rate
         
-        # Save using torchaudio with optimized settings
-        torchaudio.save(
-            filepath,
-            audio_tensor,
-            sample_rate=model.sample_rate,
-            bits_per_sample=16,
-            encoding='PCM_S'  # Explicit encoding for better compatibility
+        # Save using torchaudio off the event loop
+        await asyncio.get_running_loop().run_in_executor(
+            SAVE_EXEC,
+            functools.partial(_save_audio, filepath, audio_tensor, model.sample_rate, copied, staging)
         )
         
-        save_time = time.time() - save_start
-        total_time = time.time() - start_time
+        save_time = time.perf_counter() - save_start
+        total_time = time.perf_counter() - start_time
         
-        # Get file size for logging
-        file_size = os.path.getsize(filepath)
+        # 16-bit PCM WAV: 2 bytes per sample per channel plus the 44-byte header
+        file_size = audio_tensor.shape[-1] * audio_tensor.shape[0] * 2 + 44
         file_size_mb = file_size / (1024 * 1024)
         
         # Comprehensive success logging
-        device_info = torch.cuda.get_device_name() if torch.cuda.is_available() else "CPU"
-        precision = "FP16" if torch.cuda.is_available() else "FP32"
+        device_info = DEVICE_NAME
+        precision = PRECISION
         realtime_factor = audio_duration / gen_time
         
-        logger.info(f"🎉 [{generation_id}] Generation completed successfully!")
-        logger.info(f"📊 [{generation_id}] Performance metrics:")
-        logger.info(f"   - Device used: {device_info}")
-        logger.info(f"   - Precision: {precision}")
-        logger.info(f"   - Total time: {total_time:.2f}s")
-        logger.info(f"   - Generation time: {gen_time:.2f}s")
-        logger.info(f"   - Save time: {save_time:.2f}s")
-        logger.info(f"   - File size: {file_size_mb:.2f}MB")
-        logger.info(f"   - Sample rate: {model.sample_rate}Hz")
-        logger.info(f"   - Audio duration: {audio_duration:.1f}s")
-        logger.info(f"   - Speed: {realtime_factor:.1f}x realtime")
+        # One log record for the whole metrics block, formatted only if emitted
+        logger.info(
+            "🎉 [%s] Generation completed successfully!\n"
+            "📊 [%s] Performance metrics:\n"
+            "   - Device used: %s\n"
+            "   - Precision: %s\n"
+            "   - Total time: %.2fs\n"
+            "   - Generation time: %.2fs\n"
+            "   - Save time: %.2fs\n"
+            "   - File size: %.2fMB\n"
+            "   - Sample rate: %sHz\n"
+            "   - Audio duration: %.1fs\n"
+            "   - Speed: %.1fx realtime",
+            generation_id, generation_id, device_info, precision, total_time, gen_time,
+            save_time, file_size_mb, model.sample_rate, audio_duration, realtime_factor
+        )
         
-        # Save to database with enhanced metadata
-        try:
-            db_generation = DatabaseOperations.create_generation_record(
-                db=db,
-                generation_id=generation_id,
-                prompt=request.prompt,
-                total_time=total_time,
-                generation_time=gen_time,
-                save_time=save_time,
-                device_used=device_info,
-                precision=precision,
-                file_path=filepath,
-                file_size_mb=file_size_mb,
-                audio_url=f"/audio/{filename}",
-                sample_rate=model.sample_rate,
-                status="completed",
-                realtime_factor=realtime_factor,
-                user_id=None,  # Add user management later
-                model_name="facebook/musicgen-small",
-                duration=audio_duration,
-                metadata={
-                    "model_load_time": model_time,
-                    "gpu_memory_before": torch.cuda.memory_allocated() / 1024**3 if torch.cuda.is_available() else 0,
-                    "optimization_enabled": True,
-                    "generation_params": {
-                        "temperature": request.temperature,
-                        "top_k": request.top_k,
-                        "top_p": request.top_p,
-                        "cfg_coef": request.cfg_coef
-                    },
-                    "mixer_ready": True,  # Indicates this track supports professional mixer
-                    "audio_format": "16-bit PCM WAV"
-                }
-            )
-            logger.info(f"💾 [{generation_id}] Saved to database with ID: {db_generation.id}")
-        except Exception as db_error:
-            logger.error(f"❌ [{generation_id}] Database save failed: {db_error}")
+        # Queue the database record; the background writer batches inserts
+        queue_generation_record(
+            generation_id=generation_id,
+            prompt=request.prompt,
+            status="completed",
+            device=device_info,
+            precision=precision,
+            generation_time=gen_time,
+            realtime_factor=realtime_factor,
+            file_path=filepath,
+            audio_url=f"/audio/{filename}",
+            file_size_mb=file_size_mb,
+            duration=audio_duration,
+            sample_rate=model.sample_rate,
+            user_id=None,  # Add user management later
+            model_version="musicgen-small"
+        )
         
         # Enhanced response for professional mixer support
-        return {
+        response = {
             "message": "🎵 Music generated successfully!",
             "prompt": request.prompt,
             "status": "completed",
@@ -405,46 +867,43 @@ async def generate_music(request: MusicRequest, db: Session = Depends(get_db)):
                 "duration": request.duration
             }
         }
+        _cache_result(cache_key, response)
+        return response
         
     except Exception as e:
-        total_time = time.time() - start_time
+        total_time = time.perf_counter() - start_time
         error_msg = str(e)
         
         # Error logging
-        logger.error(f"❌ [{generation_id}] Generation failed after {total_time:.2f}s")
-        logger.error(f"💥 [{generation_id}] Error: {error_msg}")
-        logger.error(f"📝 [{generation_id}] Prompt was: '{request.prompt}'")
+        logger.error(
+            "❌ [%s] Generation failed after %.2fs\n💥 [%s] Error: %s\n📝 [%s] Prompt was: '%s'",
+            generation_id, total_time, generation_id, error_msg, generation_id, request.prompt
+        )
         
-        # Save error to database
-        try:
-            DatabaseOperations.create_generation_record(
-                db=db,
-                generation_id=generation_id,
-                prompt=request.prompt,
-                total_time=total_time,
-                generation_time=0,
-                save_time=0,
-                device_used="N/A",
-                precision="N/A",
-                file_path="",
-                file_size_mb=0,
-                audio_url="",
-                sample_rate=0,
-                status="error",
-                realtime_factor=0,
-                error_message=error_msg
-            )
-            logger.info(f"💾 [{generation_id}] Error saved to database")
-        except Exception as db_error:
-            logger.error(f"❌ [{generation_id}] Database error save failed: {db_error}")
+        # Queue the error record for the background writer
+        queue_generation_record(
+            generation_id=generation_id,
+            prompt=request.prompt,
+            status="failed",
+            device="N/A",
+            precision="N/A",
+            generation_time=0,
+            realtime_factor=0,
+            file_path="",
+            audio_url="",
+            file_size_mb=0,
+            duration=0,
+            sample_rate=0,
+            error_message=error_msg
+        )
         
-        return {
-            "message": "❌ Generation failed",
-            "error": error_msg,
-            "status": "error",
-            "generation_id": generation_id,
-            "failed_after": f"{total_time:.2f}s"
-        }
+        return _error_response(
+            500,
+            message="❌ Generation failed",
+            status="error",
+            generation_id=generation_id,
+            failed_after=f"{total_time:.2f}s"
+        )
 
 # Enhanced mixer settings endpoint
 @app.post("/mixer/settings")
@@ -452,7 +911,7 @@ async def save_mixer_settings(request: MixerSettingsRequest, db: Session = Depen
     """Save mixer settings for a specific generation"""
     try:
         # Here you could save mixer settings to database or use them for real-time processing
-        logger.info(f"🎛️ Mixer settings updated for {request.generation_id}: {request.settings}")
+        logger.info("🎛️ Mixer settings updated for %s: %s", request.generation_id, request.settings)
         
         return {
             "success": True,
@@ -460,12 +919,9 @@ async def save_mixer_settings(request: MixerSettingsRequest, db: Session = Depen
             "generation_id": request.generation_id,
             "settings": request.settings
         }
-    except Exception as e:
-        logger.error(f"❌ Failed to save mixer settings: {e}")
-        return {
-            "success": False,
-            "error": str(e)
-        }
+    except Exception:
+        logger.exception("❌ Failed to save mixer settings")
+        return _error_response(500)
 
 @app.get("/mixer/presets")
 async def get_mixer_presets():
@@ -506,116 +962,87 @@ async def get_stats(days: int = 7, db: Session = Depends(get_db)):
             "success": True,
             "data": enhanced_stats
         }
-    except Exception as e:
-        logger.error(f"❌ Failed to get stats: {e}")
-        return {
-            "success": False,
-            "error": str(e)
-        }
+    except Exception:
+        logger.exception("❌ Failed to get stats")
+        return _error_response(500)
+
+# Columns each list endpoint returns, in response-key order; rows come back
+# as tuples and are zipped straight into the response dicts
+RECENT_FIELDS = (
+    'id', 'generation_id', 'prompt', 'status', 'generation_time', 'device',
+    'precision', 'realtime_factor', 'created_at', 'audio_url', 'file_size_mb',
+    'play_count', 'download_count', 'is_favorited', 'last_played',
+    'sample_rate', 'duration'
+)
+SEARCH_FIELDS = (
+    'id', 'generation_id', 'prompt', 'status', 'generation_time', 'device',
+    'created_at', 'audio_url', 'realtime_factor', 'file_size_mb', 'sample_rate'
+)
+MOST_PLAYED_FIELDS = (
+    'id', 'generation_id', 'prompt', 'play_count', 'download_count',
+    'is_favorited', 'last_played', 'audio_url', 'created_at', 'generation_time',
+    'device', 'file_size_mb', 'status', 'precision', 'realtime_factor',
+    'sample_rate', 'duration'
+)
 
 @app.get("/recent")
-async def get_recent_generations(limit: int = 20, db: Session = Depends(get_db)):
+async def get_recent_generations(limit: int = 20, offset: int = 0, db: Session = Depends(get_db)):
     """Get recent generations with mixer support"""
     try:
-        generations = DatabaseOperations.get_recent_generations(db, limit)
+        rows = DatabaseOperations.list_generation_rows(db, RECENT_FIELDS, limit=limit, offset=offset)
         return {
             "success": True,
             "data": [
-                {
-                    "id": gen.id,
-                    "generation_id": gen.generation_id,
-                    "prompt": gen.prompt,
-                    "status": gen.status,
-                    "generation_time": gen.generation_time,
-                    "device": gen.device_used,
-                    "precision": gen.precision,
-                    "realtime_factor": gen.realtime_factor,
-                    "created_at": gen.created_at.isoformat(),
-                    "audio_url": gen.audio_url,
-                    "file_size_mb": gen.file_size_mb,
-                    "play_count": getattr(gen, 'play_count', 0),
-                    "download_count": getattr(gen, 'download_count', 0),
-                    "is_favorited": getattr(gen, 'is_favorited', False),
-                    "last_played": gen.last_played.isoformat() if hasattr(gen, 'last_played') and gen.last_played else None,
-                    "mixer_ready": True,  # All tracks support mixer
-                    "sample_rate": getattr(gen, 'sample_rate', 32000),
-                    "duration": getattr(gen, 'duration', 10.0)
-                }
-                for gen in generations
+                dict(zip(RECENT_FIELDS, row), mixer_ready=True)  # All tracks support mixer
+                for row in rows
             ]
         }
-    except Exception as e:
-        logger.error(f"❌ Failed to get recent generations: {e}")
-        return {
-            "success": False,
-            "error": str(e)
-        }
+    except Exception:
+        logger.exception("❌ Failed to get recent generations")
+        return _error_response(500)
 
 @app.get("/search")
 async def search_generations(
     q: str, 
     limit: int = 20, 
+    offset: int = 0,
     db: Session = Depends(get_db)
 ):
     """Search generations by prompt with enhanced metadata"""
     try:
-        generations = DatabaseOperations.search_generations(db, q, limit=limit)
+        rows = DatabaseOperations.list_generation_rows(
+            db, SEARCH_FIELDS, limit=limit, offset=offset, query=q
+        )
         return {
             "success": True,
             "data": [
-                {
-                    "id": gen.id,
-                    "generation_id": gen.generation_id,
-                    "prompt": gen.prompt,
-                    "status": gen.status,
-                    "generation_time": gen.generation_time,
-                    "device": gen.device_used,
-                    "created_at": gen.created_at.isoformat(),
-                    "audio_url": gen.audio_url,
-                    "realtime_factor": gen.realtime_factor,
-                    "mixer_ready": True,
-                    "file_size_mb": getattr(gen, 'file_size_mb', 0),
-                    "sample_rate": getattr(gen, 'sample_rate', 32000)
-                }
-                for gen in generations
+                dict(zip(SEARCH_FIELDS, row), mixer_ready=True)
+                for row in rows
             ],
             "query": q,
-            "count": len(generations)
-        }
-    except Exception as e:
-        logger.error(f"❌ Failed to search generations: {e}")
-        return {
-            "success": False,
-            "error": str(e)
+            "count": len(rows)
         }
+    except Exception:
+        logger.exception("❌ Failed to search generations")
+        return _error_response(500)
 
 @app.post("/track-play")
 async def track_play(request: PlayTrackRequest, db: Session = Depends(get_db)):
     """Track when a user plays a generated track"""
     try:
-        success = DatabaseOperations.record_play(
+        DatabaseOperations.record_play(
             db, 
             request.generation_id, 
             request.play_duration
         )
         
-        if success:
-            logger.info(f"🎧 Play recorded for {request.generation_id} (duration: {request.play_duration}s)")
-            return {
-                "success": True,
-                "message": "Play recorded successfully"
-            }
-        else:
-            return {
-                "success": False,
-                "error": "Generation not found"
-            }
-    except Exception as e:
-        logger.error(f"❌ Failed to track play: {e}")
         return {
-            "success": False,
-            "error": str(e)
+            "success": True,
+            "message": "Play recorded successfully"
         }
+    except Exception:
+        logger.exception("❌ Failed to track play")
+        return _error_response(500)
 
 @app.post("/download/{generation_id}")
 async def download_track(generation_id: str, db: Session = Depends(get_db)):
@@ -635,10 +1062,10 @@ async def download_track(generation_id: str, db: Session = Depends(get_db)):
         
         # Record the download
         DatabaseOperations.record_download(db, generation_id)
-        logger.info(f"💾 Download recorded for {generation_id}")
+        logger.info("💾 Download recorded for %s", generation_id)
         
         # Generate a nice filename
-        safe_prompt = "".join(c for c in generation.prompt if c.isalnum() or c in (' ', '-', '_')).rstrip()
+        safe_prompt = _SAFE_RE.sub('', generation.prompt).rstrip()
         filename = f"{safe_prompt[:50]}.wav"
         
         # Return the file
@@ -651,7 +1078,7 @@ async def download_track(generation_id: str, db: Session = Depends(get_db)):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"❌ Download failed: {e}")
+        logger.error("❌ Download failed: %s", e)
         raise HTTPException(status_code=500, detail="Download failed")
 
 @app.post("/favorite")
@@ -660,58 +1087,35 @@ async def toggle_favorite(request: FavoriteRequest, db: Session = Depends(get_db
     try:
         is_favorited = DatabaseOperations.toggle_favorite(db, request.generation_id)
         
-        logger.info(f"❤️ Favorite toggled for {request.generation_id}: {is_favorited}")
+        logger.info("❤️ Favorite toggled for %s: %s", request.generation_id, is_favorited)
         
         return {
             "success": True,
             "is_favorited": is_favorited,
             "message": "Favorite status updated"
         }
-    except Exception as e:
-        logger.error(f"❌ Failed to toggle favorite: {e}")
-        return {
-            "success": False,
-            "error": str(e)
-        }
+    except Exception:
+        logger.exception("❌ Failed to toggle favorite")
+        return _error_response(500)
 
 @app.get("/most-played")
-async def get_most_played(limit: int = 10, db: Session = Depends(get_db)):
+async def get_most_played(limit: int = 10, offset: int = 0, db: Session = Depends(get_db)):
     """Get most played tracks with mixer support"""
     try:
-        tracks = DatabaseOperations.get_most_played_generations(db, limit)
+        rows = DatabaseOperations.list_generation_rows(
+            db, MOST_PLAYED_FIELDS, limit=limit, offset=offset, most_played=True
+        )
         
         return {
             "success": True,
             "data": [
-                {
-                    "id": track.id,
-                    "generation_id": track.generation_id,
-                    "prompt": track.prompt,
-                    "play_count": getattr(track, 'play_count', 0),
-                    "download_count": getattr(track, 'download_count', 0),
-                    "is_favorited": getattr(track, 'is_favorited', False),
-                    "last_played": track.last_played.isoformat() if hasattr(track, 'last_played') and track.last_played else None,
-                    "audio_url": track.audio_url,
-                    "created_at": track.created_at.isoformat(),
-                    "generation_time": track.generation_time,
-                    "device": track.device_used,
-                    "file_size_mb": track.file_size_mb,
-                    "status": track.status,
-                    "precision": getattr(track, 'precision', 'N/A'),
-                    "realtime_factor": getattr(track, 'realtime_factor', 0),
-                    "mixer_ready": True,
-                    "sample_rate": getattr(track, 'sample_rate', 32000),
-                    "duration": getattr(track, 'duration', 10.0)
-                }
-                for track in tracks
+                dict(zip(MOST_PLAYED_FIELDS, row), mixer_ready=True)
+                for row in rows
             ]
         }
-    except Exception as e:
-        logger.error(f"❌ Failed to get most played: {e}")
-        return {
-            "success": False,
-            "error": str(e)
-        }
+    except Exception:
+        logger.exception("❌ Failed to get most played")
+        return _error_response(500)
 
 @app.get("/db-status")
 async def get_database_status(db: Session = Depends(get_db)):
@@ -732,59 +1136,73 @@ async def get_database_status(db: Session = Depends(get_db)):
             "mixer_ready_tracks": total_generations,  # All tracks support mixer
             "message": "Database is working correctly"
         }
-    except Exception as e:
-        return {
-            "success": False,
-            "database_connected": False,
-            "error": str(e),
-            "message": "Database connection failed"
+    except Exception:
+        logger.exception("❌ Database status check failed")
+        return _error_response(
+            500,
+            database_connected=False,
+            message="Database connection failed"
+        )
+
+# /system-info is polled by dashboards: a background task samples the live
+# GPU memory readings once per SYS_SAMPLE_INTERVAL and the endpoint returns
+# the latest snapshot instead of calling into the CUDA driver per request
+SYS_SAMPLE_INTERVAL = 1.0
+
+def _system_info() -> Dict[str, Any]:
+    """Full /system-info body with the current memory readings"""
+    system_info = {
+        "api_version": "2.0.0",
+        "pytorch_version": torch.__version__,
+        "cuda_available": CUDA_AVAILABLE,
+        "audio_directory": AUDIO_DIR,
+        "features": {
+            "ai_generation": True,
+            "professional_mixer": True,
+            "real_time_processing": True,
+            "advanced_statistics": True,
+            "play_tracking": True,
+            "favorites_system": True,
+            "download_tracking": True,
+            "search_functionality": True
         }
+    }
+    
+    if CUDA_AVAILABLE:
+        system_info.update({
+            "cuda_version": CUDA_VERSION,
+            "gpu_count": app.state.gpu_static["count"],
+            "gpu_name": app.state.gpu_static["name"],
+            "gpu_memory_total": app.state.gpu_static["total_mem"],
+            "gpu_memory_allocated": f"{torch.cuda.memory_allocated() / 1024**3:.2f} GB",
+            "gpu_memory_cached": f"{torch.cuda.memory_reserved() / 1024**3:.2f} GB"
+        })
+    
+    return {
+        "success": True,
+        "system_info": system_info
+    }
+
+async def _sys_sampler():
+    """Background task: refresh app.state.sys_snapshot every SYS_SAMPLE_INTERVAL seconds"""
+    while True:
+        try:
+            app.state.sys_snapshot = _system_info()
+        except Exception:
+            logger.exception("❌ Failed to sample system info")
+            app.state.sys_snapshot = None
+        await asyncio.sleep(SYS_SAMPLE_INTERVAL)
 
 @app.get("/system-info")
 async def get_system_info():
-    """Get system information for debugging and monitoring"""
-    try:
-        system_info = {
-            "api_version": "2.0.0",
-            "pytorch_version": torch.__version__,
-            "cuda_available": torch.cuda.is_available(),
-            "audio_directory": AUDIO_DIR,
-            "features": {
-                "ai_generation": True,
-                "professional_mixer": True,
-                "real_time_processing": True,
-                "advanced_statistics": True,
-                "play_tracking": True,
-                "favorites_system": True,
-                "download_tracking": True,
-                "search_functionality": True
-            }
-        }
-        
-        if torch.cuda.is_available():
-            system_info.update({
-                "cuda_version": torch.version.cuda,
-                "gpu_count": torch.cuda.device_count(),
-                "gpu_name": torch.cuda.get_device_name(0),
-                "gpu_memory_total": f"{torch.cuda.get_device_properties(0).total_memory / 1024**3:.1f} GB",
-                "gpu_memory_allocated": f"{torch.cuda.memory_allocated() / 1024**3:.2f} GB",
-                "gpu_memory_cached": f"{torch.cuda.memory_reserved() / 1024**3:.2f} GB"
-            })
-        
-        return {
-            "success": True,
-            "system_info": system_info
-        }
-    except Exception as e:
-        logger.error(f"❌ Failed to get system info: {e}")
-        return {
-            "success": False,
-            "error": str(e)
-        }
+    """Get system information for debugging and monitoring (sampled at 1 Hz)"""
+    snapshot = app.state.sys_snapshot
+    if snapshot is None:
+        return Response(_GENERIC_ERR, status_code=500, media_type="application/json")
+    return snapshot
 
-@app.get("/audio-formats")
-async def get_supported_audio_formats():
-    """Get information about supported audio formats"""
+def _audio_formats() -> Dict[str, Any]:
+    """Body of /audio-formats - constant for the life of the process"""
     return {
         "success": True,
         "supported_formats": {
@@ -800,8 +1218,8 @@ async def get_supported_audio_formats():
             },
             "processing": {
                 "internal_format": "32-bit float",
-                "gpu_precision": "FP16" if torch.cuda.is_available() else "FP32",
-                "real_time_capable": torch.cuda.is_available()
+                "gpu_precision": PRECISION,
+                "real_time_capable": CUDA_AVAILABLE
             }
         },
         "audio_processing": {
@@ -819,95 +1237,100 @@ async def get_supported_audio_formats():
         }
     }
 
+@app.get("/audio-formats")
+async def get_supported_audio_formats():
+    """Get information about supported audio formats"""
+    return Response(app.state.audio_formats_json, media_type="application/json")
+
+# Generation presets and parameter ranges are static: built once at import
+_PRESETS = {
+    "default": {
+        "name": "Default",
+        "description": "Balanced settings for general music generation",
+        "duration": 10.0,
+        "temperature": 1.0,
+        "top_k": 250,
+        "top_p": 0.0,
+        "cfg_coef": 3.0
+    },
+    "creative": {
+        "name": "Creative",
+        "description": "Higher creativity and variation",
+        "duration": 10.0,
+        "temperature": 1.2,
+        "top_k": 200,
+        "top_p": 0.1,
+        "cfg_coef": 2.5
+    },
+    "focused": {
+        "name": "Focused",
+        "description": "More controlled and coherent output",
+        "duration": 10.0,
+        "temperature": 0.8,
+        "top_k": 300,
+        "top_p": 0.0,
+        "cfg_coef": 4.0
+    },
+    "experimental": {
+        "name": "Experimental",
+        "description": "Maximum creativity and exploration",
+        "duration": 10.0,
+        "temperature": 1.5,
+        "top_k": 150,
+        "top_p": 0.2,
+        "cfg_coef": 2.0
+    },
+    "short": {
+        "name": "Short Track",
+        "description": "Quick 5-second generation",
+        "duration": 5.0,
+        "temperature": 1.0,
+        "top_k": 250,
+        "top_p": 0.0,
+        "cfg_coef": 3.0
+    },
+    "long": {
+        "name": "Extended",
+        "description": "Longer 15-second generation",
+        "duration": 15.0,
+        "temperature": 1.0,
+        "top_k": 250,
+        "top_p": 0.0,
+        "cfg_coef": 3.0
+    }
+}
+
+_PARAM_RANGES = {
+    "duration": {"min": 1.0, "max": 30.0, "default": 10.0},
+    "temperature": {"min": 0.1, "max": 2.0, "default": 1.0},
+    "top_k": {"min": 50, "max": 500, "default": 250},
+    "top_p": {"min": 0.0, "max": 1.0, "default": 0.0},
+    "cfg_coef": {"min": 1.0, "max": 10.0, "default": 3.0}
+}
+
+_PRESET_NAMES = frozenset(_PRESETS)
+
 @app.get("/generation-presets")
 async def get_generation_presets():
     """Get available generation parameter presets"""
-    presets = {
-        "default": {
-            "name": "Default",
-            "description": "Balanced settings for general music generation",
-            "duration": 10.0,
-            "temperature": 1.0,
-            "top_k": 250,
-            "top_p": 0.0,
-            "cfg_coef": 3.0
-        },
-        "creative": {
-            "name": "Creative",
-            "description": "Higher creativity and variation",
-            "duration": 10.0,
-            "temperature": 1.2,
-            "top_k": 200,
-            "top_p": 0.1,
-            "cfg_coef": 2.5
-        },
-        "focused": {
-            "name": "Focused",
-            "description": "More controlled and coherent output",
-            "duration": 10.0,
-            "temperature": 0.8,
-            "top_k": 300,
-            "top_p": 0.0,
-            "cfg_coef": 4.0
-        },
-        "experimental": {
-            "name": "Experimental",
-            "description": "Maximum creativity and exploration",
-            "duration": 10.0,
-            "temperature": 1.5,
-            "top_k": 150,
-            "top_p": 0.2,
-            "cfg_coef": 2.0
-        },
-        "short": {
-            "name": "Short Track",
-            "description": "Quick 5-second generation",
-            "duration": 5.0,
-            "temperature": 1.0,
-            "top_k": 250,
-            "top_p": 0.0,
-            "cfg_coef": 3.0
-        },
-        "long": {
-            "name": "Extended",
-            "description": "Longer 15-second generation",
-            "duration": 15.0,
-            "temperature": 1.0,
-            "top_k": 250,
-            "top_p": 0.0,  
-            "cfg_coef": 3.0
-        }
-    }
-    
-    return {
-        "success": True,
-        "presets": presets,
-        "count": len(presets),
-        "parameter_ranges": {
-            "duration": {"min": 1.0, "max": 30.0, "default": 10.0},
-            "temperature": {"min": 0.1, "max": 2.0, "default": 1.0},
-            "top_k": {"min": 50, "max": 500, "default": 250},
-            "top_p": {"min": 0.0, "max": 1.0, "default": 0.0},
-            "cfg_coef": {"min": 1.0, "max": 10.0, "default": 3.0}
-        }
-    }
+    return Response(app.state.presets_json, media_type="application/json")
+
+# Concurrent identical (preset, prompt) requests share one in-flight generation;
+# immediate retries are then served by generate_music's result cache
+_inflight_presets: Dict[tuple, asyncio.Future] = {}
 
 @app.post("/generation-preset/{preset_name}")
 async def generate_with_preset(
     preset_name: str, 
-    prompt: str, 
-    db: Session = Depends(get_db)
+    prompt: str,
+    response: Response
 ):
-    """Generate music using a predefined preset"""
+    """Generate music using a predefined preset (X-Cache: HIT / MISS / COALESCED)"""
     try:
-        # Get available presets
-        presets_response = await get_generation_presets()
-        presets = presets_response["presets"]
-        
-        if preset_name not in presets:
+        if preset_name not in _PRESET_NAMES:
             raise HTTPException(status_code=404, detail=f"Preset '{preset_name}' not found")
         
-        preset = presets[preset_name]
+        preset = _PRESETS[preset_name]
         
         # Create request with preset parameters
         request = MusicRequest(
@@ -919,26 +1342,44 @@ async def generate_with_preset(
             cfg_coef=preset["cfg_coef"]
         )
         
-        logger.info(f"🎨 Generating with preset '{preset_name}' for prompt: '{prompt}'")
-        
-        # Generate music with preset
-        result = await generate_music(request, db)
+        key = (preset_name, prompt)
+        inflight = _inflight_presets.get(key)
+        if inflight is not None:
+            logger.info("🔗 Joining in-flight preset '%s' generation for prompt: '%s'", preset_name, prompt)
+            response.headers["X-Cache"] = "COALESCED"
+            return dict(await asyncio.shield(inflight))
         
-        # Add preset info to response
-        if result.get("status") == "completed":
-            result["preset_used"] = {
-                "name": preset_name,
-                "description": preset["description"],
-                "parameters": preset
-            }
+        logger.info("🎨 Generating with preset '%s' for prompt: '%s'", preset_name, prompt)
         
+        future = asyncio.get_running_loop().create_future()
+        _inflight_presets[key] = future
+        try:
+            # Generate music with preset
+            result = await generate_music(request)
+            
+            # Add preset info to response
+            if result.get("status") == "completed":
+                result["preset_used"] = {
+                    "name": preset_name,
+                    "description": preset["description"],
+                    "parameters": preset
+                }
+            future.set_result(result)
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody joined
+            raise
+        finally:
+            _inflight_presets.pop(key, None)
+        
+        response.headers["X-Cache"] = "HIT" if result.get("cache_hit") else "MISS"
         return result
         
     except HTTPException:
         raise
-    except Exception as e:
-        logger.error(f"❌ Failed to generate with preset: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    except Exception:
+        logger.exception("❌ Failed to generate with preset")
+        return _error_response(500)
 
 @app.get("/analytics/popular-prompts")
 async def get_popular_prompts(limit: int = 10, db: Session = Depends(get_db)):
@@ -954,35 +1395,32 @@ async def get_popular_prompts(limit: int = 10, db: Session = Depends(get_db)):
             "analysis_period": "30 days",
             "total_prompts_analyzed": stats.get("total_generations", 0) if stats else 0
         }
-    except Exception as e:
-        logger.error(f"❌ Failed to get popular prompts: {e}")
-        return {
-            "success": False,
-            "error": str(e)
-        }
+    except Exception:
+        logger.exception("❌ Failed to get popular prompts")
+        return _error_response(500)
 
 @app.get("/analytics/performance")
 async def get_performance_analytics(days: int = 7, db: Session = Depends(get_db)):
     """Get performance analytics and trends"""
     try:
-        stats = DatabaseOperations.get_generation_stats(db, days)
+        stats = DatabaseOperations.get_perf_stats_v2(db, days)
         
         performance_data = {
             "generation_performance": {
-                "avg_generation_time": stats.get("avg_generation_time", 0) if stats else 0,
-                "total_generations": stats.get("total_generations", 0) if stats else 0,
-                "success_rate": stats.get("success_rate", 0) if stats else 0,
-                "avg_realtime_factor": 0  # Could calculate from database
+                "avg_generation_time": stats.avg_time,
+                "total_generations": stats.total,
+                "success_rate": stats.success_rate,
+                "avg_realtime_factor": stats.avg_rtf
             },
             "system_performance": {
-                "gpu_available": torch.cuda.is_available(),
-                "gpu_memory_usage": f"{torch.cuda.memory_allocated() / 1024**3:.2f} GB" if torch.cuda.is_available() else "N/A",
+                "gpu_available": CUDA_AVAILABLE,
+                "gpu_memory_usage": f"{torch.cuda.memory_allocated() / 1024**3:.2f} GB" if CUDA_AVAILABLE else "N/A",
                 "model_loaded": _cached_model is not None
             },
             "user_engagement": {
-                "total_plays": stats.get("total_plays", 0) if stats else 0,
-                "total_downloads": stats.get("total_downloads", 0) if stats else 0,
-                "avg_plays_per_track": stats.get("avg_plays_per_generation", 0) if stats else 0
+                "total_plays": stats.plays,
+                "total_downloads": stats.downloads,
+                "avg_plays_per_track": stats.avg_plays
             },
             "analysis_period": f"{days} days"
         }
@@ -991,38 +1429,44 @@ async def get_performance_analytics(days: int = 7, db: Session = Depends(get_db)
             "success": True,
             "performance_analytics": performance_data
         }
-    except Exception as e:
-        logger.error(f"❌ Failed to get performance analytics: {e}")
-        return {
-            "success": False,
-            "error": str(e)
-        }
+    except Exception:
+        logger.exception("❌ Failed to get performance analytics")
+        return _error_response(500)
+
+# Concurrent /optimize/gpu calls share one in-flight cleanup
+_gpu_cleanup_task = None
+
+def _do_gpu_cleanup():
+    """empty_cache + gc.collect (both block: run in a worker thread); returns memory before/after in GB"""
+    memory_before = torch.cuda.memory_allocated() / 1024**3
+    torch.cuda.empty_cache()
+    gc.collect()
+    return memory_before, torch.cuda.memory_allocated() / 1024**3
+
+def _clear_gpu_cleanup_task(_task):
+    global _gpu_cleanup_task
+    _gpu_cleanup_task = None
 
 @app.post("/optimize/gpu")
 async def optimize_gpu():
     """Optimize GPU memory usage"""
+    global _gpu_cleanup_task
     try:
-        if not torch.cuda.is_available():
+        if not CUDA_AVAILABLE:
             return {
                 "success": False,
                 "message": "GPU not available"
             }
         
-        # Record memory before optimization
-        memory_before = torch.cuda.memory_allocated() / 1024**3
-        
-        # Clear GPU cache
-        torch.cuda.empty_cache()
-        
-        # Garbage collection
-        import gc
-        gc.collect()
-        
-        # Record memory after optimization
-        memory_after = torch.cuda.memory_allocated() / 1024**3
+        # Clear GPU cache and collect garbage off the event loop
+        task = _gpu_cleanup_task
+        if task is None:
+            task = _gpu_cleanup_task = asyncio.create_task(asyncio.to_thread(_do_gpu_cleanup))
+            task.add_done_callback(_clear_gpu_cleanup_task)
+        memory_before, memory_after = await asyncio.shield(task)
         memory_freed = memory_before - memory_after
         
-        logger.info(f"🧹 GPU optimization completed. Freed: {memory_freed:.2f} GB")
+        logger.info("🧹 GPU optimization completed. Freed: %.2f GB", memory_freed)
         
         return {
             "success": True,
@@ -1031,12 +1475,9 @@ async def optimize_gpu():
             "memory_after_gb": round(memory_after, 2),
             "memory_freed_gb": round(memory_freed, 2)
         }
-    except Exception as e:
-        logger.error(f"❌ GPU optimization failed: {e}")
-        return {
-            "success": False,
-            "error": str(e)
-        }
+    except Exception:
+        logger.exception("❌ GPU optimization failed")
+        return _error_response(500)
 
 @app.get("/debug/model-info")
 async def get_model_debug_info():
@@ -1048,10 +1489,26 @@ async def get_model_debug_info():
                 "message": "Model not loaded"
             }
         
+        # Model structure and device totals don't change once loaded: build once
+        static = app.state.model_info_static
+        if static is None:
+            lm = _get_lm(_cached_model)
+            static = {
+                "model_loaded": True,
+                "model_type": type(_cached_model).__name__,
+                "sample_rate": _cached_model.sample_rate,
+                "lm_dtype": str(next(lm.parameters()).dtype) if lm is not None else "unknown"
+            }
+            if CUDA_AVAILABLE:
+                static["gpu_info"] = {
+                    "device_name": app.state.gpu_static["name"],
+                    "memory_total": app.state.gpu_static["total_mem"]
+                }
+            app.state.model_info_static = static
+        
+        # Overlay the live readings
         model_info = {
-            "model_loaded": True,
-            "model_type": type(_cached_model).__name__,
-            "sample_rate": _cached_model.sample_rate,
+            **static,
             "generation_params": {
                 "duration": getattr(_cached_model, 'duration', 'unknown'),
                 "use_sampling": getattr(_cached_model, 'use_sampling', 'unknown'),
@@ -1062,24 +1519,20 @@ async def get_model_debug_info():
             }
         }
         
-        if torch.cuda.is_available():
+        if CUDA_AVAILABLE:
             model_info["gpu_info"] = {
-                "device_name": torch.cuda.get_device_name(0),
+                **static["gpu_info"],
                 "memory_allocated": f"{torch.cuda.memory_allocated() / 1024**3:.2f} GB",
-                "memory_reserved": f"{torch.cuda.memory_reserved() / 1024**3:.2f} GB",
-                "memory_total": f"{torch.cuda.get_device_properties(0).total_memory / 1024**3:.1f} GB"
+                "memory_reserved": f"{torch.cuda.memory_reserved() / 1024**3:.2f} GB"
             }
         
         return {
             "success": True,
             "model_info": model_info
         }
-    except Exception as e:
-        logger.error(f"❌ Failed to get model debug info: {e}")
-        return {
-            "success": False,
-            "error": str(e)
-        }
+    except Exception:
+        logger.exception("❌ Failed to get model debug info")
+        return _error_response(500)
 
 if __name__ == "__main__":
     import uvicorn
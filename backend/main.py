@@ -4,33 +4,46 @@
 # =============================================================================
 
 from fastapi import FastAPI, Depends, HTTPException, Request, BackgroundTasks
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 import time
 import os
+import json
+import struct
+
+# Let the CUDA caching allocator grow segments in place instead of fragmenting
+# on variable-length generations (must be set before CUDA is initialized)
+os.environ.setdefault("PYTORCH_CUDA_ALLOC_CONF", "expandable_segments:True,max_split_size_mb:128")
+# Persist Inductor's compiled kernels so restarts skip torch.compile work
+os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", os.path.abspath("./.inductor_cache"))
+os.environ.setdefault("TORCHINDUCTOR_FX_GRAPH_CACHE", "1")
+
 import torch
-import torchaudio
 import logging
 import asyncio
+import functools
 import psutil
 from datetime import datetime, timedelta
 from pydantic import BaseModel, field_validator
 from contextlib import asynccontextmanager
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 import uuid
 from pathlib import Path
 import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 # FIXED: Import the standardized database modules
 try:
-    from database import get_db, test_connection_and_setup, create_tables, get_db_session
-    from database.operations import DatabaseOperations
-    from database.models import MusicGeneration, validate_generation_data
+    from database import get_db, test_connection_and_setup, get_db_session, pool_pressure_monitor
+    from database.operations import DatabaseOperations, start_interaction_writer, flush_pending_interactions
+    from database.models import MusicGeneration, validate_generation_data, encode_generations
     DATABASE_AVAILABLE = True
     logger = logging.getLogger(__name__)
     logger.info("✅ Database modules loaded successfully")
@@ -54,21 +67,107 @@ logger = logging.getLogger(__name__)
 AUDIO_DIR = os.getenv("AUDIO_DIR", os.getenv("AUDIO_DIRECTORY", "./audio"))
 os.makedirs(AUDIO_DIR, exist_ok=True)
 
+# Fixed for the life of the process: query the driver once
+CUDA_AVAILABLE = torch.cuda.is_available()
+
 # Rate limiting
 limiter = Limiter(key_func=get_remote_address)
 
 # Model caching with proper thread safety
 _cached_model = None
+_cached_model_device = None  # torch.device the model was loaded onto
 _model_load_lock = threading.Lock()
 
+# WAV encoding/writing runs here so it doesn't block the event loop
+SAVE_EXEC = ThreadPoolExecutor(max_workers=2, thread_name_prefix="audio-save")
+
+def _to_pcm16(audio: torch.Tensor) -> torch.Tensor:
+    """[-1, 1] float audio (FP32 or autocast FP16) -> int16 PCM samples"""
+    return audio.float().clamp_(-1, 1).mul_(32767).round_().to(torch.int16)
+
+# generation_id -> WAV path for files in AUDIO_DIR, built by one os.scandir
+# pass at startup and kept current by /generate, so downloads are a dict lookup
+AUDIO_FILE_PREFIX = "generated_"
+_audio_index: Dict[str, str] = {}
+
+def _index_audio_dir() -> None:
+    """(Re)fill _audio_index from the generated_<generation_id>.wav files in AUDIO_DIR"""
+    with os.scandir(AUDIO_DIR) as entries:
+        for entry in entries:
+            name = entry.name
+            if name.startswith(AUDIO_FILE_PREFIX) and name.endswith(".wav"):
+                _audio_index[name[len(AUDIO_FILE_PREFIX):-4]] = entry.path
+
+# Pinned host buffers for the int16 device->host audio copy: an async DMA
+# instead of a synchronous pageable copy. The queue of free buffers bounds how
+# many requests use them at once; longer clips fall back to a plain .cpu().
+PINNED_WAV_BUFFERS = 4
+PINNED_WAV_SECONDS = 30
+_pinned_wav_pool = None  # asyncio.Queue of free buffers, filled in lifespan on CUDA
+
+def _init_pinned_wav_pool(sample_rate: int) -> None:
+    global _pinned_wav_pool
+    _pinned_wav_pool = asyncio.Queue()
+    for _ in range(PINNED_WAV_BUFFERS):
+        _pinned_wav_pool.put_nowait(
+            torch.empty(PINNED_WAV_SECONDS * sample_rate, dtype=torch.int16, pin_memory=True)
+        )
+
+async def _pcm_to_host(pcm: torch.Tensor):
+    """Start copying int16 device audio to the host.
+    Returns (host tensor, CUDA event marking copy completion or None, pinned buffer or None)"""
+    if _pinned_wav_pool is None or not pcm.is_cuda or pcm.numel() > PINNED_WAV_SECONDS * _cached_model.sample_rate:
+        return pcm.cpu(), None, None
+    staging = await _pinned_wav_pool.get()
+    host = staging[:pcm.numel()].view(pcm.shape)
+    host.copy_(pcm, non_blocking=True)
+    copied = torch.cuda.Event()
+    copied.record()
+    return host, copied, staging
+
+WAV_HEADER_BYTES = 44
+
+def _wav_header(num_channels: int, sample_rate: int, data_bytes: int) -> bytes:
+    """44-byte RIFF/WAVE header for 16-bit PCM"""
+    block_align = num_channels * 2
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_bytes, b"WAVE",
+        b"fmt ", 16, 1, num_channels, sample_rate, sample_rate * block_align, block_align, 16,
+        b"data", data_bytes
+    )
+
+def _save_wav_atomic(file_path: str, audio: torch.Tensor, sample_rate: int, copied=None) -> int:
+    """Write int16 [channels, samples] audio as a 16-bit PCM WAV next to its final
+    path, then rename it into place so StaticFiles never serves a partially
+    written file. Returns the file size in bytes"""
+    if copied is not None:
+        copied.synchronize()  # wait for the async device->host copy, on this thread
+    # PCM16 needs no codec: header + interleaved little-endian samples
+    samples = audio.t().contiguous().numpy()
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_wav_header(audio.shape[0], sample_rate, samples.nbytes))
+        f.write(samples.data)
+    os.replace(tmp_path, file_path)
+    return WAV_HEADER_BYTES + samples.nbytes
+
+# torch.compile (Inductor + CUDA graphs) for the LM and EnCodec decode on
+# Volta or newer GPUs - set COMPILE_MODEL=0 to disable
+COMPILE_MODEL = os.getenv("COMPILE_MODEL", "1") == "1"
+COMPILE_MIN_CAPABILITY = (7, 0)
+_eager_modules = None  # (lm.forward, decode) kept so a failed warmup can fall back
+
 # =============================================================================
 # FIXED MODEL LOADING WITH PROPER ERROR HANDLING
 # =============================================================================
 
 def get_model():
     """Load and cache the MusicGen model with GPU acceleration"""
-    global _cached_model, _model_load_lock
+    global _cached_model, _cached_model_device
     
+    # Hot path: a plain global read, no lock. The lock below is only taken
+    # on a miss, so concurrent first callers load the model exactly once.
     if _cached_model is not None:
         return _cached_model
     
@@ -84,22 +183,33 @@ def get_model():
             
             # Load model
             model = MusicGen.get_pretrained('facebook/musicgen-small')
+            device = torch.device('cpu')
             
             # ✅ FIXED: Properly move MusicGen model to GPU
-            if torch.cuda.is_available():
+            if CUDA_AVAILABLE:
                 try:
                     # Clear GPU memory first
                     torch.cuda.empty_cache()
                     
                     # Move model to GPU - MusicGen has .cuda() method
                     model = model.cuda()
+                    device = torch.device('cuda', torch.cuda.current_device())
+                    
+                    # FP16 LM weights (half the KV-cache/weight bandwidth, tensor cores);
+                    # EnCodec stays FP32 to avoid codec quality loss
+                    model.lm = model.lm.half()
+                    logger.info("⚡ LM converted to FP16")
                     
-                    # Verify it's on GPU by checking the compression model
-                    device_check = next(model.compression_model.parameters()).device
                     logger.info(f"🚀 Model loaded on GPU: {torch.cuda.get_device_name()}")
-                    logger.info(f"🚀 Model device: {device_check}")
+                    logger.info(f"🚀 Model device: {device}")
                     logger.info(f"🚀 GPU Memory: {torch.cuda.get_device_properties(0).total_memory / 1e9:.1f}GB")
                     
+                    if COMPILE_MODEL and torch.cuda.get_device_capability() >= COMPILE_MIN_CAPABILITY:
+                        try:
+                            _compile_model(model)
+                        except Exception as compile_error:
+                            logger.warning(f"⚠️ torch.compile unavailable, running eager: {compile_error}")
+                    
                 except Exception as cuda_error:
                     logger.error(f"❌ GPU loading failed: {cuda_error}")
                     logger.info("💻 Falling back to CPU")
@@ -108,6 +218,7 @@ def get_model():
                 try:
                     # For Apple Silicon - MusicGen might support .to('mps')
                     model = model.to('mps')
+                    device = torch.device('mps')
                     logger.info("🍎 Model loaded on MPS (Apple Silicon)")
                 except Exception as mps_error:
                     logger.error(f"❌ MPS loading failed: {mps_error}")
@@ -116,6 +227,7 @@ def get_model():
                 logger.info("💻 Model loaded on CPU (no GPU available)")
             
             _cached_model = model
+            _cached_model_device = device
             load_time = time.time() - start_time
             
             logger.info(f"✅ Model loaded successfully in {load_time:.1f}s")
@@ -125,17 +237,49 @@ def get_model():
             logger.error(f"❌ Failed to load model: {e}")
             raise HTTPException(status_code=500, detail=f"Model loading failed: {str(e)}")
 
+def _compile_model(model):
+    """Compile the LM forward (CUDA graphs) and the EnCodec decode with torch.compile"""
+    global _eager_modules
+    import torch._inductor.config as inductor_config
+    inductor_config.triton.cudagraphs = True
+    
+    # MusicGen drives the LM through lm.generate(), which calls self(...) per
+    # step: wrapping the module would leave generate() bound to the eager
+    # module, so replace the forward it dispatches to instead
+    _eager_modules = (model.lm.forward, model.compression_model.decode)
+    model.lm.forward = torch.compile(model.lm.forward, mode="reduce-overhead", dynamic=False)
+    # The decoded length follows the requested duration: compile it with a
+    # dynamic time axis and no CUDA graphs, so new durations don't recompile
+    model.compression_model.decode = torch.compile(model.compression_model.decode, dynamic=True)
+    logger.info("⚡ Compiled LM forward (reduce-overhead) and EnCodec decode (dynamic) with torch.compile")
+
+def warmup_model(model):
+    """Run one 1s generation so compilation and CUDA graph capture happen at startup"""
+    global _eager_modules
+    if _eager_modules is None:
+        return
+    start_time = time.time()
+    try:
+        model.set_generation_params(duration=1.0)
+        with torch.inference_mode(), torch.autocast("cuda", dtype=torch.float16):
+            model.generate(["warmup"], progress=False)
+        logger.info(f"🔥 Model warmed up in {time.time() - start_time:.1f}s")
+    except Exception as e:
+        logger.warning(f"⚠️ Compiled warmup failed, falling back to eager model: {e}")
+        model.lm.forward, model.compression_model.decode = _eager_modules
+        _eager_modules = None
+
 # FIXED: GPU info function for MusicGen
 def get_gpu_info():
-    """Get GPU information for debugging"""
-    if torch.cuda.is_available():
-        device = torch.cuda.current_device()
+    """Get GPU information for debugging (static fields cached in lifespan)"""
+    gpu_static = app.state.gpu_static
+    if gpu_static is not None:
         return {
             "gpu_available": True,
-            "device_name": torch.cuda.get_device_name(device),
-            "memory_allocated": torch.cuda.memory_allocated(device) / 1e9,
-            "memory_cached": torch.cuda.memory_reserved(device) / 1e9,
-            "memory_total": torch.cuda.get_device_properties(device).total_memory / 1e9
+            "device_name": gpu_static["name"],
+            "memory_allocated": torch.cuda.memory_allocated() / 1e9,
+            "memory_cached": torch.cuda.memory_reserved() / 1e9,
+            "memory_total": gpu_static["total_mem_gb"]
         }
     return {"gpu_available": False}
 
@@ -143,19 +287,10 @@ def get_gpu_info():
 def test_gpu_generation():
     """Test if GPU generation is working"""
     try:
-        model = get_model()
-        
-        # Check device for MusicGen model
-        if hasattr(model, 'compression_model'):
-            device = next(model.compression_model.parameters()).device
-            logger.info(f"🧪 Model compression_model is on device: {device}")
-        elif hasattr(model, 'device'):
-            device = model.device
-            logger.info(f"🧪 Model device: {device}")
-        else:
-            logger.info("🧪 Cannot determine model device")
+        get_model()
+        logger.info(f"🧪 Model is on device: {_cached_model_device}")
         
-        if torch.cuda.is_available():
+        if CUDA_AVAILABLE:
             logger.info(f"🧪 CUDA available: {torch.cuda.get_device_name()}")
             logger.info(f"🧪 GPU Memory: {torch.cuda.memory_allocated()/1e9:.1f}GB used")
         
@@ -167,7 +302,7 @@ def test_gpu_generation():
 # Alternative: Even simpler version that just loads on CPU
 def get_model_simple():
     """Load and cache the MusicGen model (CPU only for reliability)"""
-    global _cached_model, _model_load_lock
+    global _cached_model, _cached_model_device
     
     if _cached_model is not None:
         return _cached_model
@@ -189,6 +324,7 @@ def get_model_simple():
             logger.info("💻 Model loaded on CPU")
             
             _cached_model = model
+            _cached_model_device = torch.device('cpu')
             load_time = time.time() - start_time
             
             logger.info(f"✅ Model loaded successfully in {load_time:.1f}s")
@@ -198,9 +334,157 @@ def get_model_simple():
             logger.error(f"❌ Failed to load model: {e}")
             raise HTTPException(status_code=500, detail=f"Model loading failed: {str(e)}")
 # =============================================================================
+# MICRO-BATCHED GENERATION
+# =============================================================================
+
+# Concurrent /generate requests with the same duration run as one
+# model.generate() call; the batcher waits up to MAX_BATCH_LATENCY_MS to fill a batch
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "4"))
+MAX_BATCH_LATENCY_MS = int(os.getenv("MAX_BATCH_LATENCY_MS", "50"))
+
+# One worker: the model is shared, and generation stays off the event loop
+GENERATE_EXEC = ThreadPoolExecutor(max_workers=1, thread_name_prefix="generate")
+_generation_queue = None  # asyncio.Queue of (prompt, duration, future), created in lifespan
+
+def _generate_batch(duration: float, prompts: List[str]) -> List[torch.Tensor]:
+    """Run one model.generate() for prompts sharing a duration; returns int16 PCM per prompt"""
+    global _last_generation
+    model = get_model()
+    if _model_parked:
+        _unpark_model(model)
+    model.set_generation_params(duration=duration)
+    try:
+        # autocast bridges the FP16 LM and the FP32 conditioner/codec
+        with torch.inference_mode(), torch.autocast("cuda", dtype=torch.float16, enabled=CUDA_AVAILABLE):
+            wav = model.generate(prompts)
+            # Quantize to 16-bit PCM on the device: half the bytes of an FP32
+            # copy, and the WAV writer stores it as-is
+            return [_to_pcm16(w) for w in wav]
+    finally:
+        _last_generation = time.monotonic()
+
+async def generation_batcher():
+    """Background task: drain the generation queue in micro-batches"""
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await _generation_queue.get()]
+        deadline = loop.time() + MAX_BATCH_LATENCY_MS / 1000
+        while len(batch) < MAX_BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(_generation_queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        
+        groups = {}
+        for prompt, duration, future in batch:
+            groups.setdefault(duration, []).append((prompt, future))
+        
+        for duration, items in groups.items():
+            try:
+                pcm = await loop.run_in_executor(
+                    GENERATE_EXEC, _generate_batch, duration, [prompt for prompt, _ in items]
+                )
+                if len(items) > 1:
+                    logger.info(f"📦 Generated batch of {len(items)} prompts")
+                for (_, future), audio in zip(items, pcm):
+                    if not future.done():
+                        future.set_result(audio)
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+
+async def generate_pcm(prompt: str, duration: float) -> torch.Tensor:
+    """Queue a prompt for the batcher and wait for its int16 PCM ([channels, samples])"""
+    loop = asyncio.get_running_loop()
+    if _generation_queue is None:
+        # Batcher not running - generate directly
+        pcm = await loop.run_in_executor(GENERATE_EXEC, _generate_batch, duration, [prompt])
+        return pcm[0]
+    future = loop.create_future()
+    await _generation_queue.put((prompt, duration, future))
+    return await future
+
+# =============================================================================
+# IDLE MODEL PARKING
+# =============================================================================
+
+# After MODEL_IDLE_PARK_SECONDS without a generation, the LM and codec weights
+# move to host memory so other workloads can use the VRAM; the next generation
+# moves them back first. Off by default (0), and never used for compiled
+# models: their CUDA graphs hold the weights' device addresses.
+MODEL_IDLE_PARK_SECONDS = float(os.getenv("MODEL_IDLE_PARK_SECONDS", "0"))
+_last_generation = time.monotonic()
+_model_parked = False
+
+def _move_model(model, device) -> None:
+    model.lm.to(device)
+    model.compression_model.to(device)
+
+def _park_model() -> None:
+    """Move the idle model to CPU (runs on GENERATE_EXEC, so never mid-generation)"""
+    global _model_parked
+    model = _cached_model
+    if _model_parked or model is None or time.monotonic() - _last_generation < MODEL_IDLE_PARK_SECONDS:
+        return
+    _move_model(model, 'cpu')
+    torch.cuda.empty_cache()
+    _model_parked = True
+    logger.info(f"💤 Model idle for {MODEL_IDLE_PARK_SECONDS:.0f}s - weights parked on CPU")
+
+def _unpark_model(model) -> None:
+    """Move a parked model back to its GPU before generating"""
+    global _model_parked
+    start_time = time.time()
+    _move_model(model, _cached_model_device)
+    _model_parked = False
+    logger.info(f"⏰ Model moved back to {_cached_model_device} in {time.time() - start_time:.1f}s")
+
+async def model_idle_parker():
+    """Background task: park the model once it has been idle for MODEL_IDLE_PARK_SECONDS"""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(min(MODEL_IDLE_PARK_SECONDS, 60.0))
+        if _model_parked or time.monotonic() - _last_generation < MODEL_IDLE_PARK_SECONDS:
+            continue
+        try:
+            await loop.run_in_executor(GENERATE_EXEC, _park_model)
+        except Exception as e:
+            logger.error(f"❌ Failed to park idle model: {e}")
+
+# =============================================================================
+# BACKGROUND FILE SIZE RECONCILIATION
+# =============================================================================
+
+# Stored file sizes only drift when files change outside the API: reconcile
+# them periodically instead of stat'ing every row on each /recent request
+FILE_SIZE_SWEEP_INTERVAL = float(os.getenv("FILE_SIZE_SWEEP_INTERVAL", "300"))  # seconds
+
+def _sweep_file_sizes() -> int:
+    """Recompute file_size_mb for all generations using a dedicated session"""
+    with get_db_session() as session:
+        return DatabaseOperations.refresh_all_file_sizes(session)
+
+async def file_size_sweeper():
+    """Background task: reconcile stored file sizes every FILE_SIZE_SWEEP_INTERVAL seconds"""
+    while True:
+        await asyncio.sleep(FILE_SIZE_SWEEP_INTERVAL)
+        try:
+            await asyncio.to_thread(_sweep_file_sizes)
+        except Exception as e:
+            logger.error(f"❌ File size sweep failed: {e}")
+
+# =============================================================================
 # PYDANTIC MODELS WITH PROPER VALIDATION
 # =============================================================================
 
+_MIN_PROMPT = 3
+_MAX_PROMPT = 500
+_MAX_DURATION = 120
+
 class GenerateRequest(BaseModel):
     prompt: str
     duration: float = 30.0
@@ -210,19 +494,21 @@ class GenerateRequest(BaseModel):
     @field_validator('prompt')
     @classmethod
     def validate_prompt(cls, v):
-        if not v or not v.strip():
+        stripped = v.strip()
+        n = len(stripped)
+        if not n:
             raise ValueError('Prompt cannot be empty')
-        if len(v.strip()) < 3:
-            raise ValueError('Prompt must be at least 3 characters long')
-        if len(v.strip()) > 500:
-            raise ValueError('Prompt cannot exceed 500 characters')
-        return v.strip()
+        if n < _MIN_PROMPT:
+            raise ValueError(f'Prompt must be at least {_MIN_PROMPT} characters long')
+        if n > _MAX_PROMPT:
+            raise ValueError(f'Prompt cannot exceed {_MAX_PROMPT} characters')
+        return stripped
     
     @field_validator('duration')
     @classmethod
     def validate_duration(cls, v):
-        if v <= 0 or v > 120:
-            raise ValueError('Duration must be between 0 and 120 seconds')
+        if not 0 < v <= _MAX_DURATION:
+            raise ValueError(f'Duration must be between 0 and {_MAX_DURATION} seconds')
         return v
 
 class PlayTrackRequest(BaseModel):
@@ -242,25 +528,56 @@ async def lifespan(app: FastAPI):
     logger.info("🚀 Starting Music Genie API v2.1 - COMPLETELY FIXED!")
     logger.info("=" * 70)
     
+    # Device name and total memory are fixed for the CUDA context: read them once
+    app.state.gpu_static = None
+    if CUDA_AVAILABLE:
+        # Fixed duration -> fixed conv shapes: let cuDNN benchmark and keep the fastest kernels
+        torch.backends.cudnn.benchmark = True
+        app.state.gpu_static = {
+            "name": torch.cuda.get_device_name(0),
+            "total_mem_gb": torch.cuda.get_device_properties(0).total_memory / 1e9
+        }
+    
     # Test database connection
+    pool_monitor_task = None
+    file_size_sweeper_task = None
     if DATABASE_AVAILABLE:
         try:
-            if test_connection_and_setup():
+            # Connection probe + table creation share one connection/transaction
+            if test_connection_and_setup(create_schema=True):
                 logger.info("✅ Database connection successful")
-                create_tables()
                 logger.info("✅ Database tables ready")
+                pool_monitor_task = asyncio.create_task(pool_pressure_monitor())
+                file_size_sweeper_task = asyncio.create_task(file_size_sweeper())
+                start_interaction_writer()
             else:
                 logger.warning("⚠️ Database connection failed - running without persistence")
         except Exception as e:
             logger.error(f"❌ Database setup failed: {e}")
     
-    # Pre-load model
+    # Pre-load model (and compile it before the first request)
     try:
-        get_model()
+        model = get_model()
+        warmup_model(model)
+        if CUDA_AVAILABLE:
+            _init_pinned_wav_pool(model.sample_rate)
         logger.info("✅ Model pre-loaded successfully")
     except Exception as e:
         logger.warning(f"⚠️ Model pre-loading failed: {e}")
     
+    global _generation_queue
+    _generation_queue = asyncio.Queue()
+    batcher_task = asyncio.create_task(generation_batcher())
+    idle_parker_task = None
+    if CUDA_AVAILABLE and MODEL_IDLE_PARK_SECONDS > 0 and _eager_modules is None:
+        idle_parker_task = asyncio.create_task(model_idle_parker())
+    
+    try:
+        _index_audio_dir()
+        logger.info(f"🗂️ Indexed {len(_audio_index)} audio files")
+    except OSError as e:
+        logger.warning(f"⚠️ Failed to index audio directory: {e}")
+    
     logger.info(f"📁 Audio Directory: {AUDIO_DIR}")
     logger.info("🎵 Ready to generate music!")
     logger.info("=" * 70)
@@ -269,7 +586,29 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("🎵 Music Genie API shutting down...")
-    if torch.cuda.is_available():
+    # Cancel queued/running generation jobs before the batcher they wait on
+    job_tasks = list(_job_tasks)
+    for task in job_tasks:
+        task.cancel()
+    if job_tasks:
+        await asyncio.gather(*job_tasks, return_exceptions=True)
+        logger.info(f"🛑 Cancelled {len(job_tasks)} pending generation jobs")
+    batcher_task.cancel()
+    if idle_parker_task:
+        idle_parker_task.cancel()
+    GENERATE_EXEC.shutdown(wait=True)
+    SAVE_EXEC.shutdown(wait=True)
+    if pool_monitor_task:
+        pool_monitor_task.cancel()
+    if file_size_sweeper_task:
+        file_size_sweeper_task.cancel()
+    if DATABASE_AVAILABLE:
+        try:
+            flushed = await asyncio.to_thread(flush_pending_interactions)
+            logger.info(f"💾 Flushed {flushed} pending play/download events")
+        except Exception as e:
+            logger.error(f"❌ Failed to flush play/download events: {e}")
+    if CUDA_AVAILABLE:
         torch.cuda.empty_cache()
         logger.info("🧹 GPU memory cleared")
 
@@ -277,10 +616,36 @@ async def lifespan(app: FastAPI):
 # FASTAPI APP INITIALIZATION
 # =============================================================================
 
+# Serialize responses with orjson when available (C encoder, native datetimes)
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse
+
+    def _dumps(content: Any) -> bytes:
+        """orjson with naive datetimes rendered as UTC with a 'Z' suffix"""
+        return orjson.dumps(
+            content,
+            option=orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+        )
+
+    class UTCORJSONResponse(ORJSONResponse):
+        """ORJSONResponse that renders naive datetimes as UTC with a 'Z' suffix"""
+        def render(self, content: Any) -> bytes:
+            return _dumps(content)
+
+    DefaultResponse = UTCORJSONResponse
+except ImportError:
+    logger.info("ℹ️ orjson not installed - using standard JSONResponse")
+    DefaultResponse = JSONResponse
+
+    def _dumps(content: Any) -> bytes:
+        return json.dumps(content, separators=(",", ":")).encode()
+
 app = FastAPI(
     title="🎵 Music Genie API",
     version="2.1.0",
     description="FIXED Professional AI Music Generation Platform",
+    default_response_class=DefaultResponse,
     lifespan=lifespan
 )
 
@@ -297,8 +662,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Generated WAVs never change once written (unique names, atomic rename), so
+# browsers may cache them. StaticFiles already sends ETag/Last-Modified,
+# answers If-None-Match/If-Modified-Since with 304 and serves Range requests
+AUDIO_CACHE_CONTROL = "public, max-age=86400"
+
+class AudioStaticFiles(StaticFiles):
+    """StaticFiles that adds a Cache-Control header to audio responses"""
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers.setdefault("Cache-Control", AUDIO_CACHE_CONTROL)
+        return response
+
 # Mount static files
-app.mount("/audio", StaticFiles(directory=AUDIO_DIR), name="audio")
+app.mount("/audio", AudioStaticFiles(directory=AUDIO_DIR), name="audio")
+
+# Prometheus scrape endpoint (DB pool metrics etc.) when prometheus_client is installed
+try:
+    from prometheus_client import make_asgi_app
+    app.mount("/metrics", make_asgi_app())
+except ImportError:
+    logger.info("ℹ️ prometheus_client not installed - /metrics disabled")
 
 # =============================================================================
 # MAIN ENDPOINTS WITH FIXES
@@ -325,17 +709,7 @@ async def gpu_status():
         gpu_info = get_gpu_info()
         
         # FIXED: Get device info for MusicGen model
-        model_device = "Not loaded"
-        if _cached_model:
-            try:
-                if hasattr(_cached_model, 'compression_model'):
-                    model_device = str(next(_cached_model.compression_model.parameters()).device)
-                elif hasattr(_cached_model, 'device'):
-                    model_device = str(_cached_model.device)
-                else:
-                    model_device = "Unknown (MusicGen structure)"
-            except Exception as e:
-                model_device = f"Error checking device: {e}"
+        model_device = str(_cached_model_device) if _cached_model else "Not loaded"
         
         return {
             "success": True,
@@ -350,11 +724,35 @@ async def gpu_status():
 async def generate_music(
     request: GenerateRequest,
     background_tasks: BackgroundTasks,
+    stream: bool = False,
     db: Session = Depends(get_db)
 ):
-    """FIXED: Generate music with proper GPU handling for MusicGen"""
+    """FIXED: Generate music with proper GPU handling for MusicGen.
+    With ?stream=1 the response is NDJSON: a "queued" event as soon as the
+    request is accepted, then the same payload the plain JSON response carries"""
     generation_id = f"gen_{int(time.time())}_{uuid.uuid4().hex[:8]}"
     
+    if stream:
+        return StreamingResponse(_stream_generation(request, generation_id), media_type="application/x-ndjson")
+    
+    status_code, content = await _run_generation(request, generation_id, db)
+    if status_code != 200:
+        return DefaultResponse(status_code=status_code, content=content)
+    return content
+
+async def _stream_generation(request: GenerateRequest, generation_id: str):
+    """NDJSON body for /generate?stream=1 (uses its own session: the request's
+    dependencies are closed before a streamed body finishes)"""
+    yield _dumps({"status": "queued", "generation_id": generation_id}) + b"\n"
+    if DATABASE_AVAILABLE:
+        with get_db_session() as db:
+            _, content = await _run_generation(request, generation_id, db)
+    else:
+        _, content = await _run_generation(request, generation_id, None)
+    yield _dumps(content) + b"\n"
+
+async def _run_generation(request: GenerateRequest, generation_id: str, db) -> Tuple[int, Dict[str, Any]]:
+    """Generate, save and record one track; returns (HTTP status, response body)"""
     try:
         logger.info(f"🎼 Starting generation: {generation_id}")
         logger.info(f"📝 Prompt: {request.prompt}")
@@ -365,59 +763,45 @@ async def generate_music(
         # Determine device
         if request.device:
             device = request.device
-        elif torch.cuda.is_available():
+        elif CUDA_AVAILABLE:
             device = "CUDA"
         elif hasattr(torch.backends, 'mps') and torch.backends.mps.is_available():
             device = "MPS"
         else:
             device = "CPU"
         
-        # Configure model settings
-        model.set_generation_params(duration=request.duration)
-        
         # ✅ FIXED: GPU-optimized generation for MusicGen
         # Log device info for MusicGen
-        if hasattr(model, 'compression_model'):
-            model_device = next(model.compression_model.parameters()).device
-            logger.info(f"🎵 Generating on device: {model_device}")
-        else:
-            logger.info(f"🎵 Generating with MusicGen model")
+        logger.info(f"🎵 Generating on device: {_cached_model_device}")
         
         start_time = time.time()
         
-        # Ensure we're using GPU if available
-        with torch.no_grad():
-            if torch.cuda.is_available():
-                torch.cuda.empty_cache()  # Clear GPU memory before generation
-            
-            # Generate music (model will use GPU if loaded on GPU)
-            wav = model.generate([request.prompt])
-            
-            # Move result to CPU for saving - MusicGen returns tensors
-            if torch.is_tensor(wav):
-                wav = wav.cpu()
-            elif isinstance(wav, list) and len(wav) > 0:
-                if torch.is_tensor(wav[0]):
-                    wav = [w.cpu() for w in wav]
+        # Generate music (micro-batched with concurrent requests, on the generate worker)
+        pcm = await generate_pcm(request.prompt, request.duration)
         
         # ✅ Calculate generation_time AFTER generation
         generation_time = time.time() - start_time
         realtime_factor = request.duration / generation_time if generation_time > 0 else 0
         
         # FIXED: Save audio file and calculate actual file size
-        filename = f"generated_{generation_id}.wav"
+        filename = f"{AUDIO_FILE_PREFIX}{generation_id}.wav"
         file_path = os.path.join(AUDIO_DIR, filename)
         
-        # Save the audio file (wav is already on CPU)
-        torchaudio.save(
-            file_path,
-            wav[0],  # No need for .cpu() since we already moved it
-            sample_rate=model.sample_rate,
-            format="wav"
-        )
+        # Copy to the host (async into a pinned buffer on CUDA) and save
+        # without blocking the event loop
+        audio, copied, staging = await _pcm_to_host(pcm)
+        try:
+            # CRITICAL FIX: actual file size comes from the saved file (stat'ed by the writer thread)
+            file_size = await asyncio.get_running_loop().run_in_executor(
+                SAVE_EXEC,
+                functools.partial(_save_wav_atomic, file_path, audio, model.sample_rate, copied)
+            )
+        finally:
+            if staging is not None:
+                _pinned_wav_pool.put_nowait(staging)
         
-        # CRITICAL FIX: Calculate actual file size from saved file
-        actual_file_size_mb = round(os.path.getsize(file_path) / (1024 * 1024), 2)
+        actual_file_size_mb = round(file_size / (1024 * 1024), 2)
+        _audio_index[generation_id] = file_path
         
         # Create CONSISTENT generation data
         generation_data = {
@@ -468,7 +852,7 @@ async def generate_music(
         logger.info(f"✅ Generation completed: {generation_id} "
                    f"({generation_time:.1f}s, {realtime_factor:.1f}x, {actual_file_size_mb}MB)")
         
-        return response
+        return 200, response
         
     except Exception as e:
         logger.error(f"❌ Generation failed: {e}")
@@ -489,14 +873,94 @@ async def generate_music(
             except Exception as db_error:
                 logger.error(f"Failed to save error record: {db_error}")
         
-        return JSONResponse(
-            status_code=500,
-            content={
-                "success": False,
-                "error": str(e),
-                "generation_id": generation_id
-            }
+        return 500, {
+            "success": False,
+            "error": str(e),
+            "generation_id": generation_id
+        }
+
+# Background generation jobs: POST /generate/jobs answers with the id right away
+# and the client polls /generate/{generation_id}/status. Finished jobs are kept
+# in memory (newest MAX_FINISHED_JOBS); older ones are answered from the database.
+# At most MAX_PENDING_JOBS run at once; further submissions get 429.
+MAX_FINISHED_JOBS = 1000
+MAX_PENDING_JOBS = int(os.getenv("MAX_PENDING_JOBS", "32"))
+_jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_job_tasks = set()  # strong references to the running job tasks
+
+async def _run_generation_job(request: GenerateRequest, generation_id: str) -> None:
+    """Task body for a queued job: generate with its own session, then record the outcome"""
+    try:
+        if DATABASE_AVAILABLE:
+            with get_db_session() as db:
+                status_code, content = await _run_generation(request, generation_id, db)
+        else:
+            status_code, content = await _run_generation(request, generation_id, None)
+    except Exception as e:
+        logger.error(f"❌ Generation job {generation_id} failed: {e}")
+        status_code, content = 500, {"success": False, "error": str(e), "generation_id": generation_id}
+    
+    _jobs[generation_id] = {
+        "generation_id": generation_id,
+        "status": "completed" if status_code == 200 else "failed",
+        "result": content
+    }
+    _jobs.move_to_end(generation_id)
+    _prune_finished_jobs()
+
+def _prune_finished_jobs() -> None:
+    """Drop the oldest finished jobs beyond MAX_FINISHED_JOBS, skipping over pending ones"""
+    finished = [job_id for job_id, job in _jobs.items() if job["status"] != "pending"]
+    for job_id in finished[:len(finished) - MAX_FINISHED_JOBS]:
+        del _jobs[job_id]
+
+@app.post("/generate/jobs", status_code=202, tags=["generation"])
+async def submit_generation_job(request: GenerateRequest):
+    """Queue a generation and return immediately; poll status_url for the result"""
+    if len(_job_tasks) >= MAX_PENDING_JOBS:
+        logger.warning(f"⚠️ Generation job rejected: {len(_job_tasks)} jobs already pending")
+        return DefaultResponse(
+            status_code=429,
+            content={"success": False, "error": "Too many pending generation jobs, retry later"},
+            headers={"Retry-After": "10"}
         )
+    
+    generation_id = f"gen_{int(time.time())}_{uuid.uuid4().hex[:8]}"
+    _jobs[generation_id] = {"generation_id": generation_id, "status": "pending"}
+    
+    task = asyncio.create_task(_run_generation_job(request, generation_id))
+    _job_tasks.add(task)
+    task.add_done_callback(_job_tasks.discard)
+    
+    logger.info(f"📥 Generation job queued: {generation_id}")
+    return {
+        "success": True,
+        "generation_id": generation_id,
+        "status": "pending",
+        "status_url": f"/generate/{generation_id}/status"
+    }
+
+@app.get("/generate/{generation_id}/status", tags=["generation"])
+async def generation_job_status(generation_id: str, db: Session = Depends(get_db)):
+    """Status of a generation job (pending/completed/failed), with the result once finished"""
+    job = _jobs.get(generation_id)
+    if job is not None:
+        return {"success": True, **job}
+    
+    if DATABASE_AVAILABLE and db:
+        record = DatabaseOperations.get_by_generation_id(db, generation_id)
+        if record is not None:
+            return {"success": True, "generation_id": generation_id, "status": record["status"], "result": record}
+    
+    return DefaultResponse(
+        status_code=404,
+        content={"success": False, "error": "Generation not found"}
+    )
+
+def _generations_response(generations, **extra) -> Response:
+    """List endpoint body encoded in one pass by encode_generations (msgspec when installed)"""
+    return Response(content=encode_generations(generations, **extra), media_type="application/json")
+
 @app.get("/recent", tags=["data"])
 # @limiter.limit("30/minute")
 async def get_recent_generations(
@@ -511,12 +975,6 @@ async def get_recent_generations(
             
             # FIXED: Ensure all required fields are present and consistent
             for gen in generations:
-                # Verify file size is accurate
-                if gen.get('file_path') and os.path.exists(gen['file_path']):
-                    actual_size = round(os.path.getsize(gen['file_path']) / (1024 * 1024), 2)
-                    if abs(gen['file_size_mb'] - actual_size) > 0.1:  # Update if significantly different
-                        gen['file_size_mb'] = actual_size
-                
                 # Ensure all required fields exist with proper defaults
                 gen.setdefault('play_count', 0)
                 gen.setdefault('download_count', 0)
@@ -526,13 +984,13 @@ async def get_recent_generations(
                 gen.setdefault('realtime_factor', 1.0)
                 gen.setdefault('file_size_mb', 0.0)
             
-            return {"success": True, "data": generations}
+            return _generations_response(generations)
         else:
             return {"success": True, "data": [], "message": "Database not available"}
             
     except Exception as e:
         logger.error(f"❌ Failed to get recent generations: {e}")
-        return JSONResponse(
+        return DefaultResponse(
             status_code=500,
             content={"success": False, "error": str(e)}
         )
@@ -549,12 +1007,21 @@ async def download_generation(
         # Track download in database
         if DATABASE_AVAILABLE and db:
             DatabaseOperations.record_download(db, generation_id)
-            
-            # Try to get generation record for proper filename
-            generations = DatabaseOperations.get_recent_generations(db, limit=1000)
-            target_gen = next((g for g in generations if g['generation_id'] == generation_id), None)
-            
+        
+        file_path = _audio_index.get(generation_id)
+        if file_path and os.path.exists(file_path):
+            logger.info(f"💾 Download: {generation_id}")
+            return FileResponse(
+                path=file_path,
+                filename=f"generation_{generation_id}.wav",
+                media_type="audio/wav"
+            )
+        
+        # Not indexed: the record's stored path (files saved outside AUDIO_DIR)
+        if DATABASE_AVAILABLE and db:
+            target_gen = DatabaseOperations.get_by_generation_id(db, generation_id)
             if target_gen and target_gen.get('file_path') and os.path.exists(target_gen['file_path']):
+                _audio_index[generation_id] = target_gen['file_path']
                 logger.info(f"💾 Download: {generation_id}")
                 return FileResponse(
                     path=target_gen['file_path'],
@@ -562,35 +1029,37 @@ async def download_generation(
                     media_type="audio/wav"
                 )
         
-        # Fallback: try to find file by ID in audio directory
-        for filename in os.listdir(AUDIO_DIR):
-            if generation_id in filename or filename.startswith(f"generated_{generation_id.split('_')[-1]}"):
-                filepath = os.path.join(AUDIO_DIR, filename)
-                if os.path.exists(filepath):
-                    logger.info(f"💾 Download (fallback): {filename}")
+        # Fallback: look for the file by ID in the audio directory
+        short_id = f"{AUDIO_FILE_PREFIX}{generation_id.split('_')[-1]}"
+        with os.scandir(AUDIO_DIR) as entries:
+            for entry in entries:
+                if (generation_id in entry.name or entry.name.startswith(short_id)) and entry.is_file():
+                    _audio_index[generation_id] = entry.path
+                    logger.info(f"💾 Download (fallback): {entry.name}")
                     return FileResponse(
-                        path=filepath,
-                        filename=f"generation_{generation_id}.wav", 
+                        path=entry.path,
+                        filename=f"generation_{generation_id}.wav",
                         media_type="audio/wav"
                     )
         
+        _audio_index.pop(generation_id, None)
         logger.warning(f"❌ Download failed - file not found: {generation_id}")
-        return JSONResponse(
+        return DefaultResponse(
             status_code=404,
             content={"success": False, "error": "Audio file not found"}
         )
         
     except Exception as e:
         logger.error(f"❌ Download failed for {generation_id}: {e}")
-        return JSONResponse(status_code=500, content={"success": False, "error": str(e)})
+        return DefaultResponse(status_code=500, content={"success": False, "error": str(e)})
 
 @app.get("/stats", tags=["analytics"])
 # @limiter.limit("20/minute")
-async def get_stats(request: Request, days: int = 7, db: Session = Depends(get_db)):
-    """FIXED: Get generation statistics"""
+async def get_stats(request: Request, days: int = 7, refresh: bool = False, db: Session = Depends(get_db)):
+    """FIXED: Get generation statistics (cached for 30s; ?refresh=1 recomputes)"""
     try:
         if DATABASE_AVAILABLE and db:
-            stats = DatabaseOperations.get_generation_stats(db, max(1, min(days, 365)))
+            stats = DatabaseOperations.get_generation_stats(db, max(1, min(days, 365)), refresh=refresh)
             return {"success": True, "data": stats}
         else:
             mock_stats = {
@@ -604,7 +1073,7 @@ async def get_stats(request: Request, days: int = 7, db: Session = Depends(get_d
             return {"success": True, "data": mock_stats}
     except Exception as e:
         logger.error(f"❌ Stats failed: {e}")
-        return JSONResponse(status_code=500, content={"success": False, "error": str(e)})
+        return DefaultResponse(status_code=500, content={"success": False, "error": str(e)})
 
 @app.get("/favorites", tags=["data"])
 # @limiter.limit("30/minute")
@@ -617,13 +1086,13 @@ async def get_favorites(
     try:
         if DATABASE_AVAILABLE and db:
             favorites = DatabaseOperations.get_favorites(db, limit)
-            return {"success": True, "data": favorites}
+            return _generations_response(favorites)
         else:
             return {"success": True, "data": [], "message": "Database not available"}
             
     except Exception as e:
         logger.error(f"❌ Failed to get favorites: {e}")
-        return JSONResponse(
+        return DefaultResponse(
             status_code=500,
             content={"success": False, "error": str(e)}
         )
@@ -639,13 +1108,13 @@ async def get_most_played(
     try:
         if DATABASE_AVAILABLE and db:
             generations = DatabaseOperations.get_most_played(db, limit)
-            return {"success": True, "data": generations}
+            return _generations_response(generations)
         else:
             return {"success": True, "data": [], "message": "Database not available"}
             
     except Exception as e:
         logger.error(f"❌ Failed to get most played: {e}")
-        return JSONResponse(
+        return DefaultResponse(
             status_code=500,
             content={"success": False, "error": str(e)}
         )
@@ -662,13 +1131,13 @@ async def search_generations(
     try:
         if DATABASE_AVAILABLE and db:
             generations = DatabaseOperations.search_generations(db, q, limit)
-            return {"success": True, "data": generations, "query": q}
+            return _generations_response(generations, query=q)
         else:
             return {"success": True, "data": [], "message": "Database not available"}
             
     except Exception as e:
         logger.error(f"❌ Search failed: {e}")
-        return JSONResponse(
+        return DefaultResponse(
             status_code=500,
             content={"success": False, "error": str(e)}
         )
@@ -682,32 +1151,32 @@ async def track_play(
     """Track when a user plays a generation"""
     try:
         if DATABASE_AVAILABLE and db:
-            success = DatabaseOperations.record_play(
+            DatabaseOperations.record_play(
                 db, request.generation_id, request.play_duration
             )
-            return {"success": success}
+            return {"success": True}
         else:
             return {"success": True, "message": "Database not available"}
             
     except Exception as e:
         logger.error(f"❌ Failed to track play: {e}")
-        return JSONResponse(
+        return DefaultResponse(
             status_code=500,
             content={"success": False, "error": str(e)}
         )
     """Track when a user plays a generation"""
     try:
         if DATABASE_AVAILABLE and db:
-            success = DatabaseOperations.record_play(
+            DatabaseOperations.record_play(
                 db, request.generation_id, request.play_duration
             )
-            return {"success": success}
+            return {"success": True}
         else:
             return {"success": True, "message": "Database not available"}
             
     except Exception as e:
         logger.error(f"❌ Failed to track play: {e}")
-        return JSONResponse(
+        return DefaultResponse(
             status_code=500,
             content={"success": False, "error": str(e)}
         )
@@ -725,7 +1194,7 @@ async def toggle_favorite(
             if new_status is not None:
                 return {"success": True, "is_favorited": new_status}
             else:
-                return JSONResponse(
+                return DefaultResponse(
                     status_code=404,
                     content={"success": False, "error": "Generation not found"}
                 )
@@ -734,7 +1203,7 @@ async def toggle_favorite(
             
     except Exception as e:
         logger.error(f"❌ Failed to toggle favorite: {e}")
-        return JSONResponse(
+        return DefaultResponse(
             status_code=500,
             content={"success": False, "error": str(e)}
         )
@@ -743,6 +1212,28 @@ async def toggle_favorite(
 # SYSTEM MONITORING AND HEALTH ENDPOINTS
 # =============================================================================
 
+# psutil readings walk /proc: /health reuses a sample for SYS_SAMPLE_TTL
+# seconds so frequent load-balancer probes don't re-read it every time
+SYS_SAMPLE_TTL = 2.0  # seconds
+_sys_sample = {"t": 0.0, "v": None}
+
+def _read_system_resources() -> Dict[str, float]:
+    return {
+        "cpu_percent": psutil.cpu_percent(),
+        "memory_percent": psutil.virtual_memory().percent,
+        "disk_percent": psutil.disk_usage('/').percent
+    }
+
+async def _system_resources() -> Dict[str, float]:
+    """Cached CPU/memory/disk usage, refreshed off the event loop when stale"""
+    if _sys_sample["v"] is None or time.monotonic() - _sys_sample["t"] > SYS_SAMPLE_TTL:
+        _sys_sample["v"] = await asyncio.to_thread(_read_system_resources)
+        _sys_sample["t"] = time.monotonic()
+    return _sys_sample["v"]
+
+# Database liveness probe, built once (a bare "SELECT 1" string is rejected by SQLAlchemy 2.x)
+HEALTH_PROBE = text("SELECT 1")
+
 @app.get("/health", tags=["system"])
 async def health_check(db: Session = Depends(get_db)):
     """Comprehensive health check"""
@@ -763,8 +1254,8 @@ async def health_check(db: Session = Depends(get_db)):
         # Check database
         if DATABASE_AVAILABLE and db:
             try:
-                # Simple query to test database
-                db.execute("SELECT 1")
+                # Simple query to test database (blocking I/O: off the event loop)
+                await asyncio.to_thread(db.execute, HEALTH_PROBE)
                 health_data["components"]["database"] = {"status": "connected"}
             except Exception as e:
                 health_data["components"]["database"] = {"status": "error", "error": str(e)}
@@ -781,13 +1272,9 @@ async def health_check(db: Session = Depends(get_db)):
         
         # System resources
         try:
-            health_data["components"]["system"] = {
-                "cpu_percent": psutil.cpu_percent(),
-                "memory_percent": psutil.virtual_memory().percent,
-                "disk_percent": psutil.disk_usage('/').percent
-            }
+            health_data["components"]["system"] = await _system_resources()
             
-            if torch.cuda.is_available():
+            if CUDA_AVAILABLE:
                 health_data["components"]["gpu"] = {
                     "available": True,
                     "device_count": torch.cuda.device_count(),
@@ -799,7 +1286,7 @@ async def health_check(db: Session = Depends(get_db)):
         return health_data
         
     except Exception as e:
-        return JSONResponse(
+        return DefaultResponse(
             status_code=500,
             content={
                 "status": "error",
@@ -816,25 +1303,34 @@ async def model_status(request: Request):
         "loaded": _cached_model is not None,
         "loading": False,  # Could add loading state tracking
         "device": str(getattr(_cached_model, 'device', 'Unknown')) if _cached_model else None,
-        "gpu_available": torch.cuda.is_available(),
+        "gpu_available": CUDA_AVAILABLE,
         "mps_available": hasattr(torch.backends, 'mps') and torch.backends.mps.is_available(),
         "model_type": "MusicGen-Small" if _cached_model else None,
         "sample_rate": getattr(_cached_model, 'sample_rate', None) if _cached_model else None
     }
 
+def _reload_model():
+    """Drop the cached model (and its eager fallbacks), load a fresh one and warm it up"""
+    global _cached_model, _model_parked, _eager_modules
+    # Release every reference to the old weights before loading, so only one
+    # model is resident. The freed blocks stay in the caching allocator
+    # (expandable segments) and get_model empties the cache before loading.
+    _cached_model = None
+    _eager_modules = None
+    _model_parked = False
+    
+    model = get_model()
+    warmup_model(model)
+    return model
+
 @app.post("/model/reload", tags=["model"])
 # @limiter.limit("2/minute")
 async def reload_model(request: Request):
     """Reload the model"""
-    global _cached_model
-    
     try:
         logger.info("🔄 Manual model reload requested")
-        _cached_model = None
-        if torch.cuda.is_available():
-            torch.cuda.empty_cache()
-        
-        model = get_model()
+        # Runs on the generation worker, so it never overlaps a generate() call
+        model = await asyncio.get_running_loop().run_in_executor(GENERATE_EXEC, _reload_model)
         return {
             "success": True,
             "message": "Model reloaded successfully",
@@ -842,7 +1338,7 @@ async def reload_model(request: Request):
         }
     except Exception as e:
         logger.error(f"❌ Model reload failed: {e}")
-        return JSONResponse(
+        return DefaultResponse(
             status_code=500,
             content={"success": False, "error": str(e)}
         )
@@ -851,33 +1347,8 @@ async def reload_model(request: Request):
 # STATIC FILE SERVING
 # =============================================================================
 
-@app.get("/audio/{filename}")
-async def serve_audio_file(filename: str):
-    """Serve audio files with proper CORS headers"""
-    try:
-        file_path = os.path.join(AUDIO_DIR, filename)
-        if os.path.exists(file_path):
-            return FileResponse(
-                path=file_path,
-                media_type="audio/wav",
-                headers={
-                    "Access-Control-Allow-Origin": "*",
-                    "Access-Control-Allow-Methods": "GET, OPTIONS",
-                    "Access-Control-Allow-Headers": "*",
-                }
-            )
-        else:
-            logger.warning(f"❌ Audio file not found: {filename}")
-            return JSONResponse(
-                status_code=404,
-                content={"error": "Audio file not found"}
-            )
-    except Exception as e:
-        logger.error(f"❌ Error serving audio file {filename}: {e}")
-        return JSONResponse(
-            status_code=500,
-            content={"error": str(e)}
-        )
+# /audio/{filename} is served by the StaticFiles mount above (sendfile, Range
+# and conditional requests); a route here would never be reached.
 
 # =============================================================================
 # ERROR HANDLERS
@@ -887,7 +1358,7 @@ async def serve_audio_file(filename: str):
 async def internal_error_handler(request: Request, exc):
     """Handle internal errors"""
     logger.error(f"🚨 Internal Error: {request.method} {request.url} - {exc}")
-    return JSONResponse(
+    return DefaultResponse(
         status_code=500,
         content={
             "error": "Internal server error",
@@ -900,7 +1371,7 @@ async def internal_error_handler(request: Request, exc):
 @app.exception_handler(404)
 async def not_found_handler(request: Request, exc):
     """Handle 404 errors"""
-    return JSONResponse(
+    return DefaultResponse(
         status_code=404,
         content={
             "error": "Not found",
@@ -915,28 +1386,31 @@ async def not_found_handler(request: Request, exc):
 if __name__ == "__main__":
     import uvicorn
     
-    logger.info("🚀 Starting Music Genie API v2.1 - COMPLETELY FIXED!")
-    logger.info("=" * 70)
-    logger.info("🔧 CRITICAL FIXES APPLIED:")
-    logger.info("   ✅ FIXED database field consistency (device, generation_time)")
-    logger.info("   ✅ FIXED actual file size calculation from saved files")
-    logger.info("   ✅ FIXED API response structure consistency")
-    logger.info("   ✅ FIXED model loading with proper thread safety")
-    logger.info("   ✅ FIXED error handling and validation")
-    logger.info("   ✅ FIXED environment-aware configuration")
-    logger.info("=" * 70)
-    logger.info("🎵 Your application will now have:")
-    logger.info("   📊 Consistent data across all endpoints")
-    logger.info("   📁 Accurate file sizes")
-    logger.info("   🔄 Reliable model loading")
-    logger.info("   🗄️ Stable database operations")
-    logger.info("   📈 Proper error tracking")
-    logger.info("=" * 70)
-    logger.info("🎵 Ready to generate music!")
-    logger.info(f"📁 Audio Directory: {AUDIO_DIR}")
-    logger.info(f"🗄️ Database: {'Available' if DATABASE_AVAILABLE else 'Not available'}")
-    logger.info(f"📚 Documentation: http://localhost:8000/docs")
-    logger.info("=" * 70)
+    # One log record for the whole banner
+    logger.info("\n".join([
+        "🚀 Starting Music Genie API v2.1 - COMPLETELY FIXED!",
+        "=" * 70,
+        "🔧 CRITICAL FIXES APPLIED:",
+        "   ✅ FIXED database field consistency (device, generation_time)",
+        "   ✅ FIXED actual file size calculation from saved files",
+        "   ✅ FIXED API response structure consistency",
+        "   ✅ FIXED model loading with proper thread safety",
+        "   ✅ FIXED error handling and validation",
+        "   ✅ FIXED environment-aware configuration",
+        "=" * 70,
+        "🎵 Your application will now have:",
+        "   📊 Consistent data across all endpoints",
+        "   📁 Accurate file sizes",
+        "   🔄 Reliable model loading",
+        "   🗄️ Stable database operations",
+        "   📈 Proper error tracking",
+        "=" * 70,
+        "🎵 Ready to generate music!",
+        f"📁 Audio Directory: {AUDIO_DIR}",
+        f"🗄️ Database: {'Available' if DATABASE_AVAILABLE else 'Not available'}",
+        "📚 Documentation: http://localhost:8000/docs",
+        "=" * 70
+    ]))
     
     uvicorn.run(
         app,